@@ -0,0 +1,754 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis library in src/data_analysis_functions.py.
+
+These exercise the functions directly (rather than running the scripts)
+on the sample roster and on a small synthetic roster with malformed rows.
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / 'src'))
+
+import data_analysis_functions as daf  # noqa: E402
+
+SAMPLE_CSV = ROOT / 'data' / 'students.csv'
+
+
+def write_roster(path, rows=500, seed=217):
+    """Write a deterministic roster with a few bad ages, bad grades and short rows."""
+    rng = random.Random(seed)
+    subjects = ['Math', 'Science', 'History', 'English', 'Art']
+    lines = ['name,age,grade,subject']
+    for i in range(rows):
+        age = str(rng.randint(13, 19)) if rng.random() > 0.05 else 'n/a'
+        grade = f"{rng.uniform(40, 100):.1f}" if rng.random() > 0.05 else 'absent'
+        if rng.random() < 0.02:
+            lines.append(f"Student{i},{age}")
+            continue
+        lines.append(f"Student{i},{age},{grade},{rng.choice(subjects)}")
+    lines.append('Top,16,100,Math')
+    lines.append('AlsoTop,15,100,Art')
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+def detailed_report_body(students, path):
+    """Render the detailed report and drop the timestamp line."""
+    assert daf.generate_detailed_report(students, str(path))
+    return [ln for ln in path.read_text(encoding='utf-8').splitlines()
+            if not ln.startswith('Report generated on:')]
+
+
+@pytest.fixture
+def python_backend():
+    previous = daf.set_stats_backend('python')
+    yield
+    daf.set_stats_backend(previous)
+
+
+def test_iter_students_matches_load_students():
+    assert list(daf.iter_students(str(SAMPLE_CSV), chunk_size=16)) == daf.load_students(str(SAMPLE_CSV))
+
+
+def test_fused_stats_match_individual_functions():
+    students = daf.load_students(str(SAMPLE_CSV))
+    stats = daf.StudentStats.from_students(students)
+    assert stats.average_grade == daf.calculate_average_grade(students)
+    assert stats.average_age == daf.calculate_average_age(students)
+    assert stats.highest_grade == daf.find_highest_grade(students)
+    assert stats.math_count == daf.count_math_students(students)
+    assert stats.top_names == ['George', 'Gal']
+
+
+def test_table_matches_dict_rows(python_backend):
+    students = daf.load_students(str(SAMPLE_CSV))
+    table = daf.load_data(str(SAMPLE_CSV), columnar=True)
+    assert list(table) == students
+    assert daf.analyze_data(table) == daf.analyze_data(students)
+
+
+def test_table_masks_ages_outside_int64(tmp_path):
+    csv_path = tmp_path / 'huge.csv'
+    csv_path.write_text('name,age,grade,subject\nHuge,99999999999999999999,90,Math\nOk,15,80,Art\n', encoding='utf-8')
+    table = daf.StudentTable.from_csv(str(csv_path))
+    table.append({'name': 'Inf', 'age': float('inf'), 'grade': 70.0, 'subject': 'Art'})
+    table.append({'name': 'Neg', 'age': -10 ** 30, 'grade': 60.0, 'subject': 'Art'})
+    assert [s['age'] for s in table] == [None, 15, None, None]
+    assert list(table.mask('age')) == [0, 1, 0, 0]
+    assert daf.analyze_data(table)['average_age'] == 15
+
+    # A NaN grade is missing whether it comes from a dict or from the raw fields
+    table.append({'name': 'NanDict', 'age': 15, 'grade': float('nan'), 'subject': 'Art'})
+    table.append_fields('NanText', '15', 'nan', 'Art')
+    assert list(table.mask('grade'))[-2:] == [0, 0]
+    assert [s['name'] for s in daf.top_k(table, 2)] == ['Huge', 'Ok']
+
+
+def test_numpy_backend_parity(tmp_path):
+    pytest.importorskip('numpy')
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    table = daf.StudentTable.from_csv(str(csv_path))
+
+    outputs = {}
+    previous = daf.STATS_BACKEND
+    try:
+        for backend in ('python', 'numpy'):
+            daf.set_stats_backend(backend)
+            grades = list(table.present('grade'))
+            outputs[backend] = (
+                daf.format_report(daf.StudentStats.from_students(table)),
+                daf.analyze_grade_distribution(grades),
+                [s['name'] for s in daf.find_top_performers(table, 90)],
+                detailed_report_body(table, tmp_path / f'{backend}.txt'),
+                f"{daf.calculate_average_grade(table):.6f}",
+                f"{daf.calculate_average_age(table):.6f}",
+                daf.find_highest_grade(table),
+            )
+    finally:
+        daf.set_stats_backend(previous)
+    assert outputs['python'] == outputs['numpy']
+
+
+@pytest.mark.parametrize('backend', ['python', 'auto'])
+def test_grade_distribution_accepts_generators(backend):
+    previous = daf.set_stats_backend(backend)
+    try:
+        grades = [s['grade'] for s in daf.load_students(str(SAMPLE_CSV))]
+        assert daf.analyze_grade_distribution(g for g in grades) == daf.analyze_grade_distribution(grades)
+        assert daf.analyze_grade_distribution(g for g in []) == {}
+    finally:
+        daf.set_stats_backend(previous)
+
+
+def test_parallel_loader_matches_serial(tmp_path):
+    import parallel_loader
+
+    csv_path = str(write_roster(tmp_path / 'roster.csv', rows=2000))
+    serial = daf.load_students(csv_path)
+    assert parallel_loader.load_students_parallel(csv_path, workers=3, min_range_bytes=1024) == serial
+
+    stats = parallel_loader.student_stats_parallel(csv_path, workers=3, min_range_bytes=1024)
+    expected = daf.StudentStats.from_students(serial)
+    assert daf.format_report(stats) == daf.format_report(expected)
+    assert stats.top_names == expected.top_names
+
+
+def test_mmap_scanner_matches_load_students(tmp_path, monkeypatch):
+    import mmap_scanner
+
+    monkeypatch.setattr(mmap_scanner, 'BLOCK_SIZE', 100)  # many blocks, rows cut at every boundary
+    roster = write_roster(tmp_path / 'roster.csv')
+    text = roster.read_text(encoding='utf-8')
+    (tmp_path / 'crlf.csv').write_bytes(('\n\n' + text).replace('\n', '\r\n').encode('utf-8'))
+    (tmp_path / 'cr.csv').write_bytes(text.replace('\n', '\r').encode('utf-8'))
+    for csv_path in (str(roster), str(tmp_path / 'crlf.csv'), str(tmp_path / 'cr.csv')):
+        students = daf.load_students(csv_path)
+        assert mmap_scanner.scan_students(csv_path) == students
+        assert mmap_scanner.analyze_csv(csv_path) == daf.analyze_data(students)
+        assert daf.format_report(mmap_scanner.scan_stats(csv_path)) == \
+            daf.format_report(daf.StudentStats.from_students(students))
+        assert mmap_scanner.scan_stats(csv_path).to_dict() == daf.StudentStats.from_students(students).to_dict()
+
+
+def test_parse_cache_round_trip_and_invalidate(tmp_path):
+    import columnar_format
+    import parse_cache
+
+    csv_path = str(write_roster(tmp_path / 'roster.csv'))
+    cache = parse_cache.ParseCache(str(tmp_path / 'cache'))
+    expected = daf.load_students(csv_path)
+    assert list(cache.load_table(csv_path)) == expected  # miss: parse and store
+    assert parse_cache.load_students_cached(csv_path, cache=cache) == expected  # hit
+    entries = list((tmp_path / 'cache').glob('*.stcol'))
+    assert len(entries) == 1
+    assert list(columnar_format.load_columnar(str(entries[0]))[0]) == expected
+
+    cache.invalidate(csv_path)
+    assert not list((tmp_path / 'cache').glob('*.stcol'))
+
+    tiny = parse_cache.ParseCache(str(tmp_path / 'tiny'), max_bytes=1)
+    tiny.load_table(csv_path)
+    assert not list((tmp_path / 'tiny').glob('*.stcol'))
+
+    # Names the columnar format cannot hold are served but not stored
+    odd = daf.StudentTable.from_students([{'name': 'A\nB', 'age': 15, 'grade': 90.0, 'subject': 'Math'}])
+    cache._store('0' * 64, odd)
+    assert '0' * 64 not in cache._index['entries']
+
+
+def test_incremental_stats_follow_appends_and_rewrites(tmp_path):
+    import incremental
+
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    state_path = str(tmp_path / 'state.json')
+
+    def expected():
+        return daf.format_report(daf.StudentStats.from_students(daf.load_students(str(csv_path))))
+
+    assert incremental.incremental_report(str(csv_path), state_path) == expected()
+
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('Late,17,100,History\nPartial,16,91')  # no trailing newline yet
+    assert incremental.incremental_report(str(csv_path), state_path) == expected()
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('.5,Math\n')
+    assert incremental.incremental_report(str(csv_path), state_path) == expected()
+
+    write_roster(csv_path, rows=50, seed=1)  # rewritten and shorter
+    assert incremental.incremental_report(str(csv_path), state_path) == expected()
+
+    # A same-size edit in the middle of the consumed prefix is caught by the full-prefix hash
+    data = csv_path.read_bytes()
+    middle = data.index(b'\n', len(data) // 2) + 1
+    digit = data.index(b',', middle) + 1
+    edited = data[:digit] + (b'9' if data[digit:digit + 1] != b'9' else b'8') + data[digit + 1:]
+    csv_path.write_bytes(edited)
+    st = os.stat(csv_path)
+    os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert incremental.incremental_report(str(csv_path), state_path) == expected()
+    assert incremental.incremental_analysis(str(csv_path), state_path) == daf.analyze_data(daf.load_students(str(csv_path)))
+
+
+def test_range_reader_streams_rows(tmp_path):
+    import tracemalloc
+
+    csv_path = write_roster(tmp_path / 'roster.csv', rows=20000)
+    size = csv_path.stat().st_size
+    with open(csv_path, 'rb') as f:
+        start = daf.data_start(f)
+    assert list(daf.iter_students_range(str(csv_path), start, size)) == daf.load_students(str(csv_path))
+
+    # A rebuild streams the file instead of holding it (and its decoded text) in memory
+    import incremental
+    tracemalloc.start()
+    try:
+        stats = incremental.update_stats(str(csv_path), str(tmp_path / 'state.json'))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert stats.count == len(daf.load_students(str(csv_path)))
+    assert peak < size / 2
+
+
+def test_analyze_data_incremental(tmp_path, monkeypatch):
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    monkeypatch.chdir(tmp_path)  # state goes under ./.cache/incremental
+    monkeypatch.setattr(daf, 'CSV_PATH', str(csv_path))
+    assert daf.analyze_data(incremental=True) == daf.analyze_data(daf.load_students(str(csv_path)))
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('Late,17,100,Math\n')
+    assert daf.analyze_data(incremental=True) == daf.analyze_data()
+    assert list((tmp_path / '.cache' / 'incremental').glob('roster.csv-*.json'))
+    with pytest.raises(ValueError):
+        daf.analyze_data(approximate=True, incremental=True)
+
+
+def test_write_report_lines_atomic_replace(tmp_path, monkeypatch):
+    lines = [f"line {i}\n" for i in range(5000)]
+    expected = "".join(lines)
+    plain = tmp_path / 'plain.txt'
+    daf.write_report_lines(lines, plain, buffer_size=1, atomic=False)
+    assert plain.read_text(encoding='utf-8') == expected
+
+    report = tmp_path / 'report.txt'
+    previous = os.umask(0o027)
+    try:
+        # Other threads may be creating files, so the process umask must never be touched
+        with monkeypatch.context() as m:
+            m.setattr(os, 'umask', lambda mask: pytest.fail('umask changed'))
+            daf.write_report_lines(iter(lines), report, buffer_size=4096)
+    finally:
+        os.umask(previous)
+    assert report.read_text(encoding='utf-8') == expected
+    assert report.stat().st_mode & 0o777 == 0o640  # as open() would create it under that umask
+
+    def failing():
+        yield "partial\n"
+        raise RuntimeError("render failed")
+
+    os.chmod(report, 0o600)
+    with pytest.raises(RuntimeError):
+        daf.write_report_lines(failing(), report, buffer_size=1)
+    assert report.read_text(encoding='utf-8') == expected  # old report kept
+    daf.write_report_lines(["new\n"], report)
+    assert report.stat().st_mode & 0o777 == 0o600  # existing permissions kept
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['plain.txt', 'report.txt']  # no temp files
+
+
+def test_top_k_matches_sort_and_report_ties(tmp_path):
+    csv_path = str(write_roster(tmp_path / 'roster.csv'))
+    students = daf.load_students(csv_path)
+    expected = sorted(students, key=lambda s: -s['grade'])[:10]
+    assert daf.top_k(iter(students), 10) == expected
+    assert daf.top_k(daf.StudentTable.from_students(students), 10) == expected
+
+    stats = daf.StudentStats.from_students(students)
+    assert [s['name'] for s in daf.top_k(students, 1, ties=True)] == stats.top_names == ['Top', 'AlsoTop']
+    sample = daf.load_students(str(SAMPLE_CSV))
+    assert [s['name'] for s in daf.top_k(sample, 1, ties=True)] == ['George', 'Gal']
+    assert [s['name'] for s in daf.top_k(sample, 2, ties=True)] == ['George', 'Gal']
+    assert [s['name'] for s in daf.top_k(sample, 3, ties=True)] == ['George', 'Gal', 'Kathy']
+    assert list(daf.top_performers(iter(sample))) == daf.find_top_performers(sample)
+
+    nan_rows = [{'name': n, 'grade': g} for n, g in (('N', float('nan')), ('A', 90.0), ('B', 95.0))]
+    assert [s['name'] for s in daf.top_k(nan_rows, 2)] == ['B', 'A']
+
+
+def test_grade_index_queries_match_scans(tmp_path):
+    csv_path = str(write_roster(tmp_path / 'roster.csv'))
+    table = daf.StudentTable.from_csv(csv_path)
+    grades = sorted(table.present('grade'))
+    index = table.grade_index(by_subject=True)
+    assert table.grade_index(by_subject=True) is index
+
+    assert index.count_range(75, 85) == sum(1 for g in grades if 75 <= g <= 85)
+    assert index.median() == pytest.approx(statistics.median(grades))
+    math = [s['grade'] for s in table if s['subject'] == 'Math' and s['grade'] is not None]
+    assert index.for_subject('Math').count_range(90, None) == sum(1 for g in math if g >= 90)
+
+    custom = [('high', 85), ('mid', 65), ('low', None)]
+    assert daf.analyze_grade_distribution(index, custom) == daf.analyze_grade_distribution(grades, custom)
+    assert daf.analyze_grade_distribution(index) == daf.analyze_grade_distribution(grades)
+
+
+def test_custom_buckets_agree_across_backends():
+    grades = [95, 70, 50, float('nan')]
+    custom = [('honors', 90), ('pass', 60), ('fail', None)]
+    results = [daf.analyze_grade_distribution(daf.GradeIndex(grades), custom)]
+    previous = daf.STATS_BACKEND
+    try:
+        for backend in ('python', 'auto'):
+            daf.set_stats_backend(backend)
+            results.append(daf.analyze_grade_distribution(grades, custom))
+    finally:
+        daf.set_stats_backend(previous)
+    assert results == [{'honors': 1, 'pass': 1, 'fail': 2}] * 3
+
+    for bad in ([('low', None), ('high', 85)], [('pass', 60), ('fail', None), ('honors', 90)],
+                [('pass', 60), ('honors', 90)]):
+        with pytest.raises(ValueError):
+            daf.analyze_grade_distribution(grades, bad)
+        with pytest.raises(ValueError):
+            daf.GradeIndex(grades).bucket_counts(bad)
+
+
+def test_batch_merges_per_file_partials(tmp_path, python_backend):
+    import batch_analysis
+
+    schools = tmp_path / 'schools'
+    schools.mkdir()
+    everyone = []
+    for seed in range(3):
+        path = write_roster(schools / f'school{seed}.csv', rows=200, seed=seed)
+        everyone += daf.load_students(str(path))
+
+    batch = batch_analysis.run_batch(str(schools), str(tmp_path / 'reports'), workers=2, progress=False)
+    assert not batch['failed']
+    assert len(list((tmp_path / 'reports' / 'files').glob('*_report.txt'))) == 3
+    expected = daf.StudentStats.from_students(everyone)
+    assert daf.format_report(batch['stats']) == daf.format_report(expected)
+
+    # An input named combined.csv keeps its own report next to the merged one
+    write_roster(schools / 'combined.csv', rows=20, seed=9)
+    out_dir = tmp_path / 'cli'
+    assert batch_analysis.main([str(schools), '--workers', '1', '--out-dir', str(out_dir)]) == 0
+    assert (out_dir / 'files' / 'combined_report.txt').read_text(encoding='utf-8') == \
+        daf.generate_report(daf.load_students(str(schools / 'combined.csv')))
+    total = len(everyone) + len(daf.load_students(str(schools / 'combined.csv')))
+    assert f'Total students: {total}\n' in (out_dir / 'combined_report.txt').read_text(encoding='utf-8')
+
+    # Failures and empty matches give a non-zero exit status, also through the main CLI
+    import data_analysis
+    (schools / 'broken.csv').write_bytes(b'name,age,grade,subject\n\xff\xfe,1,2,3\n')
+    assert batch_analysis.main([str(schools), '--out-dir', str(out_dir)]) == 1
+    assert data_analysis.run_cli(['batch', str(tmp_path / 'nothing' / '*.csv'), '--out-dir', str(out_dir)]) == 1
+    # Global options go before the subcommand, batch and diff included
+    assert data_analysis.run_cli(['--backend', 'python', 'batch', str(schools / 'school*.csv'),
+                                  '--workers', '1', '--out-dir', str(tmp_path / 'globals')]) == 0
+    assert (tmp_path / 'globals' / 'combined_report.txt').exists()
+
+
+def test_group_by_engine_streaming_and_parallel(tmp_path):
+    import parallel_loader
+
+    csv_path = str(write_roster(tmp_path / 'roster.csv', rows=2000))
+    students = daf.load_students(csv_path)
+    stats = daf.StudentStats.from_students(students)
+
+    by_subject = daf.GroupedStats.from_students(daf.iter_students(csv_path), 'subject')
+    assert by_subject.counts() == stats.by_subject
+    math = [s['grade'] for s in students if s['subject'] == 'Math']
+    assert by_subject.groups['Math'].average_grade == pytest.approx(sum(math) / len(math))
+    assert by_subject.groups['Math'].grade_max == max(math)
+    # StudentStats shares GroupStats' accumulation, so the merged groups give the same aggregates
+    merged = daf.GroupStats()
+    for group in by_subject.groups.values():
+        merged.merge(group)
+    for field in ('count', 'grade_count', 'grade_min', 'grade_max', 'age_count', 'age_sum', 'distribution'):
+        assert getattr(merged, field) == getattr(stats, field)
+
+    composite = parallel_loader.group_by_parallel(csv_path, ('subject', 'age'), workers=3, min_range_bytes=1024)
+    serial = daf.GroupedStats.from_students(students, ('subject', 'age'))
+    assert [(r['key'], r['count']) for r in composite.rows()] == [(r['key'], r['count']) for r in serial.rows()]
+    assert daf.format_group_report(serial).startswith('Grades by subject, age')
+
+
+def test_running_moments_merge_matches_statistics(tmp_path):
+    csv_path = str(write_roster(tmp_path / 'roster.csv'))
+    grades = [s['grade'] for s in daf.load_students(csv_path)]
+
+    whole = daf.RunningMoments()
+    parts = [daf.RunningMoments() for _ in range(3)]
+    for i, g in enumerate(grades):
+        whole.add(g)
+        parts[i % 3].add(g)
+    merged = daf.RunningMoments()
+    for part in parts:
+        merged.merge(part)
+
+    for moments in (whole, merged):
+        assert moments.count == len(grades)
+        assert moments.mean == pytest.approx(statistics.fmean(grades))
+        assert moments.variance == pytest.approx(statistics.pvariance(grades))
+        assert (moments.min, moments.max) == (min(grades), max(grades))
+
+    results = daf.analyze_data(daf.load_students(csv_path))
+    assert results['grade_stddev'] == pytest.approx(statistics.pstdev(grades))
+
+
+def test_sketches_stay_within_error_bounds():
+    import sketches
+
+    rng = random.Random(5)
+    values = [rng.uniform(0, 100) for _ in range(20000)]
+    halves = sketches.KLLSketch(k=200), sketches.KLLSketch(k=200)
+    for i, v in enumerate(values):
+        halves[i % 2].update(v)
+    kll = halves[0].merge(halves[1])
+    assert kll.n == len(values)
+    ordered = sorted(values)
+    bound = kll.normalized_rank_error() * len(values)
+    for q in (0.1, 0.5, 0.9):
+        estimate = kll.quantile(q)
+        assert abs(sum(1 for v in ordered if v < estimate) - q * len(values)) <= bound
+
+    hll = sketches.HyperLogLog()
+    other = sketches.HyperLogLog()
+    for i in range(30000):
+        (hll if i % 2 else other).add(f"Student{i % 12000}")
+    estimate = hll.merge(other).estimate()
+    assert abs(estimate - 12000) <= 3 * hll.relative_error() * 12000
+
+
+def test_analyze_data_approximate_mode():
+    students = daf.load_students(str(SAMPLE_CSV))
+    results = daf.analyze_data(students, approximate=True)
+    approx = results['approximate']
+    assert approx['p50_grade'] == {'value': 98.0, 'rank_error': 0.0}
+    assert approx['distinct_subjects']['value'] == 4
+    assert approx['grade_distribution']['A (90-100)'] == (5, 0)
+    grades = [s['grade'] for s in students]
+    assert daf.analyze_grade_distribution(grades, approximate=True)['B (80-89)'] == (1, 0)
+
+
+def test_async_pipeline_matches_serial_reports(tmp_path, monkeypatch):
+    import asyncio
+    import async_pipeline
+
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    with open(csv_path, 'a', encoding='utf-8', newline='') as f:
+        f.write('Crlf,15,91,Art\r\nLast,16,77,Math')  # CRLF row and no final newline
+    students = daf.load_students(str(csv_path))
+
+    report, detailed = tmp_path / 'report.txt', tmp_path / 'detailed.txt'
+    asyncio.run(async_pipeline.run_pipeline(str(csv_path), str(report), str(detailed), chunk_size=97))
+    assert report.read_text(encoding='utf-8') == daf.generate_report(students)
+    assert detailed_report_body(students, tmp_path / 'serial.txt') == \
+        [ln for ln in detailed.read_text(encoding='utf-8').splitlines() if not ln.startswith('Report generated on:')]
+
+    # A parse error stops the reader thread instead of leaving it blocked on the full queue
+    bad = tmp_path / 'bad.csv'
+    bad.write_bytes(b'name,age,grade,subject\n\xff,1,2,3\n' + b'Row,15,80,Math\n' * 2000)
+    reads = []
+    real_read_chunks = async_pipeline._read_chunks
+
+    def tracked(file_path, chunk_size, queue, loop, stop):
+        real_read_chunks(file_path, chunk_size, queue, loop, stop)
+        reads.append(stop.is_set())
+
+    monkeypatch.setattr(async_pipeline, '_read_chunks', tracked)
+    with pytest.raises(UnicodeDecodeError):
+        asyncio.run(async_pipeline.load_and_aggregate(str(bad), chunk_size=64, queue_size=1))
+    assert reads == [True]
+
+
+def test_columnar_format_round_trip(tmp_path):
+    import columnar_format
+
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('Nobody,??,abc,\n')  # missing age, coerced grade, empty subject
+    students = daf.load_students(str(csv_path))
+    out = columnar_format.save_columnar(students, str(tmp_path / 'roster.stcol'))
+
+    table, results = columnar_format.load_columnar(out)
+    assert list(table) == students
+    # Results were computed from the table, whose NumPy path may round differently
+    expected = json.loads(json.dumps(daf.analyze_data(students)))
+    assert results == {k: pytest.approx(v) if isinstance(v, float) else v for k, v in expected.items()}
+    assert daf.load_data(out) == students
+
+    renamed = tmp_path / 'roster.bin'  # detected by magic bytes, not extension
+    os.replace(out, renamed)
+    assert list(daf.load_data(str(renamed), columnar=True)) == students
+    assert daf.load_data(str(csv_path)) == students
+
+
+def test_cli_subcommands_and_lazy_imports(tmp_path, capsys):
+    import subprocess
+    import data_analysis
+
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    students = daf.load_students(str(csv_path))
+    expected = daf.generate_report(students)
+    for extra in ([], ['--stats-only']):
+        out = tmp_path / f'report{len(extra)}.txt'
+        assert data_analysis.run_cli(['report', '--input', str(csv_path), '--output', str(out), *extra]) is None
+        assert out.read_text(encoding='utf-8') == expected
+
+    capsys.readouterr()
+    data_analysis.run_cli(['stats', '--stats-only', '--input', str(csv_path)])
+    results = json.loads(capsys.readouterr().out)
+    assert results['math_count'] == daf.analyze_data(students)['math_count']
+    assert results['grade_stddev'] == pytest.approx(daf.analyze_data(students)['grade_stddev'])
+    assert data_analysis.run_cli(['stats', '--input', str(tmp_path / 'missing.csv')]) == 1
+
+    # A stats-only run never imports NumPy
+    probe = ("import sys, data_analysis; data_analysis.run_cli(['stats', '--stats-only', '--input', sys.argv[1]]);"
+             "assert 'numpy' not in sys.modules, 'numpy imported'")
+    result = subprocess.run([sys.executable, '-c', probe, str(csv_path)], cwd=ROOT / 'src',
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+
+
+def test_cli_profile_writes_stage_records(tmp_path):
+    import subprocess
+
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    rows = len(daf.load_students(str(csv_path)))
+    profile_out = tmp_path / 'profile.json'
+    env = dict(os.environ, STUDENT_PROFILE_OUT=str(profile_out))
+    env.pop('STUDENT_PROFILE', None)
+    for args in (['--profile', 'stats', '--input', str(csv_path)],
+                 ['detailed', '--input', str(csv_path), '--output', str(tmp_path / 'detailed.txt'), '--profile'],
+                 ['report', '--profile', '--input', str(csv_path), '--output', str(tmp_path / 'report.txt')]):
+        profile_out.unlink(missing_ok=True)
+        result = subprocess.run([sys.executable, str(ROOT / 'src' / 'data_analysis.py'), *args],
+                                cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        stages = {r['stage']: r for r in json.loads(profile_out.read_text(encoding='utf-8'))['stages']}
+        first = stages['load_students' if 'detailed' in args else 'load_stats']
+        assert first['calls'] == 1 and first['rows'] == rows
+        assert first['rows_per_sec'] == pytest.approx(rows / first['seconds'])
+        if 'report' in args:
+            assert stages['generate_report']['calls'] == stages['save_report']['calls'] == 1
+
+    # Without the flag or the environment variable nothing is recorded
+    profile_out.unlink()
+    subprocess.run([sys.executable, str(ROOT / 'src' / 'data_analysis.py'), 'stats', '--input', str(csv_path)],
+                   cwd=tmp_path, env=env, capture_output=True, timeout=60, check=True)
+    assert not profile_out.exists()
+
+
+def test_analysis_server_queries_cache_and_reload(tmp_path):
+    import threading
+    import urllib.request
+    import analysis_server
+
+    csv_path = write_roster(tmp_path / 'roster.csv')
+    students = daf.load_students(str(csv_path))
+    server = analysis_server.make_server(str(csv_path), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(query):
+        with urllib.request.urlopen(base + query, timeout=10) as resp:
+            return json.loads(resp.read())
+
+    try:
+        assert get('/analyze')['math_count'] == daf.analyze_data(students)['math_count']
+        assert [s['name'] for s in get('/top?threshold=90')] == \
+            [s['name'] for s in daf.find_top_performers(students, 90)]
+        assert [s['name'] for s in get('/top?k=1&ties=1')] == ['Top', 'AlsoTop']
+        assert get('/distribution') == daf.analyze_grade_distribution([s['grade'] for s in students])
+        math = [s['grade'] for s in students if s['subject'] == 'Math']
+        assert get('/percentile?p=50&subject=Math')['grade'] == pytest.approx(statistics.median(math))
+        assert get('/subject?name=Math')['count'] == len(math)
+        for bad in ('/percentile?p=abc', '/top?k=inf', '/top?k=nan', '/top?k=-1'):
+            with pytest.raises(urllib.error.HTTPError) as err:
+                get(bad)
+            assert err.value.code == 400
+        assert get('/health')['cached_queries'] > 0
+
+        # Appending rows changes mtime/size: the roster reloads and the cache is dropped
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            f.write('Newcomer,16,99,Math\n')
+        st = os.stat(csv_path)
+        os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        assert get('/subject?name=Math')['count'] == len(math) + 1
+        health = get('/health')
+        assert health['reloads'] == 2 and health['rows'] == len(students) + 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_validating_parser_policies(tmp_path):
+    csv_path = tmp_path / 'roster.csv'
+    csv_path.write_text('name,age,grade,subject\n'
+                        '"Smith, John",15,91,Math\n'
+                        'BadAge,xx,88,Art\n'
+                        'NanGrade,15,nan,Art\n'
+                        'short,1\n'
+                        '"Multi\nLine",16,70,Science\n'
+                        'Ok,17,65,Math\n', encoding='utf-8')
+    path = str(csv_path)
+
+    coerce = daf.ValidationSummary('coerce')
+    students = daf.load_students(path, summary=coerce)
+    assert [s['name'] for s in students] == ['Smith, John', 'BadAge', 'NanGrade', 'Multi\nLine', 'Ok']
+    assert students[1]['age'] is None and students[2]['grade'] == 0.0
+    assert (coerce.rows, coerce.accepted, coerce.quoted) == (6, 5, 2)
+    assert coerce.rejected == {'short row': 1} and coerce.coerced == {'age': 1, 'grade': 1}
+    assert [line for line, _ in coerce.samples] == [3, 4, 5]
+
+    skip = daf.ValidationSummary()
+    assert [s['name'] for s in daf.iter_students(path, policy='skip', summary=skip)] == \
+        ['Smith, John', 'Multi\nLine', 'Ok']
+    assert skip.policy == 'skip' and skip.rejected == {'bad age': 1, 'bad grade': 1, 'short row': 1}
+
+    with pytest.raises(daf.RowValidationError, match='line 3'):
+        daf.load_students(path, policy='fail')
+
+    # A stray quote is literal; an unterminated one rejects only its own line
+    stray = tmp_path / 'stray.csv'
+    stray.write_text('name,age,grade,subject\n'
+                     'Jo"Jo,15,90,Math\n'
+                     '"Open,16,80,Art\n'
+                     'After,15,70,Math\n', encoding='utf-8')
+    for policy in ('coerce', 'skip'):
+        summary = daf.ValidationSummary()
+        names = [s['name'] for s in daf.iter_students(str(stray), policy=policy, summary=summary)]
+        assert names == ['Jo"Jo', 'After']
+        assert summary.rejected == {'malformed quotes': 1} and summary.samples[0][0] == 3
+    with pytest.raises(daf.RowValidationError, match='line 3'):
+        daf.load_students(str(stray), policy='fail')
+    import data_analysis
+    assert data_analysis.run_cli(['report', '--input', str(stray), '--policy', 'skip',
+                                  '--output', str(tmp_path / 'stray_report.txt')]) is None
+
+    # The default path is unchanged, and clean files validate without findings
+    assert daf.load_students(path)[0]['name'] == '"Smith'  # legacy split ignores quotes
+    clean = daf.ValidationSummary()
+    assert daf.load_students(SAMPLE_CSV, summary=clean) == daf.load_students(SAMPLE_CSV)
+    assert clean.clean and clean.rows == len(daf.load_students(SAMPLE_CSV))
+
+
+def test_external_sort_spills_and_orders_records(tmp_path):
+    import external_sort
+
+    csv_path = write_roster(tmp_path / 'roster.csv', rows=2000)
+    students = daf.load_students(str(csv_path))
+    spill = tmp_path / 'spill'
+    spill.mkdir()
+
+    # A tiny budget and fan-in force many runs and a multi-pass merge
+    merged = external_sort.external_sorted(students, external_sort.SORT_ORDERS['grade'],
+                                           memory_budget=20_000, tmp_dir=str(spill), fan_in=4)
+    first = next(merged)
+    (sort_dir,) = spill.iterdir()
+    assert 1 <= len(list(sort_dir.iterdir())) <= 4  # merged down to the fan-in
+    by_grade = [first] + list(merged)
+    assert not list(spill.iterdir())  # runs are removed once the merge finishes
+
+    finite = [s for s in students if s['grade'] == s['grade']]
+    assert by_grade[:len(finite)] == sorted(finite, key=lambda s: -s['grade'])  # stable, highest first
+    for order in ('name', 'subject'):
+        expected = sorted(students, key=external_sort.SORT_ORDERS[order])
+        assert list(external_sort.sorted_students(students, order, memory_budget=50_000)) == expected
+
+    def records(path):
+        text = path.read_text(encoding='utf-8')
+        return text[text.index('INDIVIDUAL STUDENT RECORDS'):]
+
+    report = tmp_path / 'by_name.txt'
+    daf.generate_detailed_report(students, str(report), order='name', memory_budget=30_000)
+    in_memory = tmp_path / 'in_memory.txt'
+    daf.generate_detailed_report(sorted(students, key=lambda s: s['name']), str(in_memory))
+    assert records(report) == records(in_memory)
+    with pytest.raises(ValueError):
+        daf.generate_detailed_report(students, str(report), order='age')
+
+
+def test_roster_diff_partitioned_matches_in_memory(tmp_path, monkeypatch):
+    import roster_diff
+
+    old_path = write_roster(tmp_path / 'old.csv', rows=800)
+    old = daf.load_students(str(old_path))
+    new = [dict(s) for s in old[40:]]           # first 40 removed
+    for s in new[:25]:
+        s['grade'] = s['grade'] + 5 if s['grade'] == s['grade'] else 50.0
+    new[30]['subject'] = 'Art'
+    new += [{'name': f'New{i}', 'age': 15, 'grade': 80.0, 'subject': 'Math'} for i in range(7)]
+    new_path = tmp_path / 'new.csv'
+    with open(new_path, 'w', encoding='utf-8') as f:
+        f.write('name,age,grade,subject\n')
+        f.writelines(f"{s['name']},{s['age'] if s['age'] is not None else ''},{s['grade']},{s['subject']}\n"
+                     for s in new)
+    # Names repeat in the synthetic roster, so match on (name, age) like a real roster key would
+    key = ('name', 'age')
+    in_memory = roster_diff.diff_rosters(str(old_path), str(new_path), key, limit=None)
+    partitioned = roster_diff.diff_rosters(str(old_path), str(new_path), key, memory_budget=4096,
+                                           limit=None, tmp_dir=str(tmp_path))
+    assert not [p for p in tmp_path.iterdir() if p.is_dir()]  # partitions cleaned up
+    assert in_memory.counts == partitioned.counts
+    assert in_memory.counts['added'] - in_memory.counts['removed'] == 7 - 40
+    assert in_memory.counts['changed'] >= 26
+    assert [e[1] for e in in_memory.changed] == [e[1] for e in partitioned.changed]
+
+    # A tiny cap forces oversize partitions to be split again; no more than the cap is ever open
+    opened = []
+    real_partitions = roster_diff._Partitions
+    def counting(count, tmp_dir):
+        opened.append(count)
+        return real_partitions(count, tmp_dir)
+    monkeypatch.setattr(roster_diff, 'MAX_PARTITIONS', 3)
+    monkeypatch.setattr(roster_diff, '_Partitions', counting)
+    capped = roster_diff.diff_rosters(str(old_path), str(new_path), key, memory_budget=1024,
+                                      limit=None, tmp_dir=str(tmp_path))
+    assert max(opened) == 3 and len(opened) > 2
+    assert capped.counts == in_memory.counts
+    assert sorted(e[1] for e in capped.changed) == sorted(e[1] for e in in_memory.changed)
+    monkeypatch.undo()
+
+    report = roster_diff.format_diff_report(partitioned)
+    assert report.startswith('Roster Delta Report\n' + '=' * 30)
+    assert f"Total students: {len(daf.load_students(str(old_path)))} -> " in report
+    assert '  New0 (grade 80.0, Math)' in report
+    short = roster_diff.format_diff_report(roster_diff.diff_rosters(str(old_path), str(new_path), key, limit=3))
+    assert f"  ... and {in_memory.counts['changed'] - 3} more" in short
+
+    # --memory-budget takes the same sizes as `detailed --memory-budget`
+    out = tmp_path / 'delta.txt'
+    roster_diff.main([str(old_path), str(new_path), '--key', 'name,age', '--limit', '0',
+                      '--memory-budget', '4K', '--output', str(out)])
+    assert out.read_text(encoding='utf-8') == report
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the student analysis pipeline.
+
+For each roster size it generates a deterministic synthetic CSV, then
+times load_students, analyze_data, generate_report,
+generate_detailed_report and main() end to end, plus the mmap scanner's
+scan_students and scan_stats next to their text-reader counterparts
+(best and median of --repeat runs), and measures each one's peak Python heap with tracemalloc
+in a separate, untimed run. The cold_start:* targets time fresh
+interpreter runs of the CLI (src/data_analysis.py), startup included,
+next to a bare `python -c pass` for reference. Results are written as JSON so runs from
+different commits can be compared with --compare.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 1e3 1e4 1e5 --out benchmarks/results/latest.json
+    python benchmarks/run_benchmarks.py --rows 1e5 --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import data_analysis_functions as daf  # noqa: E402
+import mmap_scanner  # noqa: E402
+from synthetic_roster import write_roster  # noqa: E402
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+
+CLI = str(ROOT / 'src' / 'data_analysis.py')
+# Arguments after the interpreter; run inside workspace() so data/students.csv resolves
+COLD_START_COMMANDS = {
+    'cold_start:python': ['-c', 'pass'],
+    'cold_start:report': [CLI, 'report'],
+    'cold_start:report_stats_only': [CLI, 'report', '--stats-only'],
+    'cold_start:stats_stats_only': [CLI, 'stats', '--stats-only'],
+}
+
+
+@contextlib.contextmanager
+def workspace(csv_path):
+    """Temporary project dir with data/students.csv -> csv_path, as the cwd.
+
+    main() and generate_report() use the relative CSV_PATH, so they are
+    pointed at the synthetic roster this way.
+    """
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='bench-ws-') as tmp:
+        (Path(tmp) / 'data').mkdir()
+        os.symlink(os.path.abspath(csv_path), Path(tmp) / 'data' / 'students.csv')
+        os.chdir(tmp)
+        try:
+            yield Path(tmp)
+        finally:
+            os.chdir(previous)
+
+
+# Targets that reuse an already-loaded student list
+NEEDS_STUDENTS = {'analyze_data', 'generate_detailed_report'}
+
+
+def make_targets(csv_path, out_dir, only=None):
+    """Return {name: zero-arg callable} for every stage being benchmarked.
+
+    The roster is parsed up front (outside the timed and traced runs), and
+    only when a selected target needs the student list.
+    """
+    students = None
+    if only is None or NEEDS_STUDENTS & set(only):
+        students = daf.load_students(csv_path)
+
+    def run_main():
+        with workspace(csv_path), contextlib.redirect_stdout(io.StringIO()):
+            daf.main()
+
+    def run_generate_report():
+        with workspace(csv_path):
+            daf.generate_report()
+
+    def run_detailed():
+        with contextlib.redirect_stdout(io.StringIO()):
+            daf.generate_detailed_report(students, os.path.join(out_dir, 'detailed.txt'))
+
+    return {
+        'load_students': lambda: daf.load_students(csv_path),
+        'scan_students': lambda: mmap_scanner.scan_students(csv_path),
+        'stats_from_rows': lambda: daf.StudentStats().update(daf.iter_students(csv_path)),
+        'scan_stats': lambda: mmap_scanner.scan_stats(csv_path),
+        'analyze_data': lambda: daf.analyze_data(students),
+        'generate_report': run_generate_report,
+        'generate_detailed_report': run_detailed,
+        'main': run_main,
+    }
+
+
+def make_cold_start_targets():
+    """Return {name: zero-arg callable} that each launch a fresh interpreter."""
+    def launcher(args):
+        return lambda: subprocess.run([sys.executable, *args], check=True,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return {name: launcher(args) for name, args in COLD_START_COMMANDS.items()}
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_memory(func):
+    """Peak traced Python heap (bytes) allocated while running func once."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def run(rows_list, repeat, malformed_rate, seed, data_dir, only=None):
+    results = []
+    for rows in rows_list:
+        csv_path = os.path.join(data_dir, f'roster-{rows}-{seed}-{malformed_rate}.csv')
+        if not os.path.exists(csv_path):
+            write_roster(csv_path, rows, malformed_rate=malformed_rate, seed=seed)
+        with tempfile.TemporaryDirectory(prefix='bench-out-') as out_dir:
+            for name, func in make_targets(csv_path, out_dir, only).items():
+                if only and name not in only:
+                    continue
+                results.append(measure(name, func, rows, repeat, peak_memory(func)))
+        # Subprocess heaps are invisible to tracemalloc, so no peak for these
+        with workspace(csv_path):
+            for name, func in make_cold_start_targets().items():
+                if only and name not in only:
+                    continue
+                results.append(measure(name, func, rows, repeat, None))
+    return results
+
+
+def measure(name, func, rows, repeat, peak_bytes):
+    timings = time_call(func, repeat)
+    result = {
+        'target': name,
+        'rows': rows,
+        'repeat': repeat,
+        'seconds_best': min(timings),
+        'seconds_median': statistics.median(timings),
+        'rows_per_sec': rows / min(timings) if min(timings) else None,
+        'peak_bytes': peak_bytes,
+    }
+    peak = f"{peak_bytes / 1e6:.1f} MB" if peak_bytes is not None else "n/a"
+    print(f"{name:>30} {rows:>11,} rows  best {result['seconds_best']:.4f}s  "
+          f"median {result['seconds_median']:.4f}s  peak {peak}")
+    return result
+
+
+def compare(results, baseline_path):
+    """Print best-time and peak-memory ratios against an earlier results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['target'], r['rows']): r for r in json.load(f)['results']}
+    print(f"\nComparison against {baseline_path} (ratio > 1.0 means slower / bigger now)")
+    for r in results:
+        old = baseline.get((r['target'], r['rows']))
+        if not old:
+            continue
+        t_ratio = r['seconds_best'] / old['seconds_best'] if old['seconds_best'] else float('nan')
+        m_ratio = r['peak_bytes'] / old['peak_bytes'] if r['peak_bytes'] and old['peak_bytes'] else float('nan')
+        print(f"{r['target']:>30} {r['rows']:>11,} rows  time x{t_ratio:.2f}  memory x{m_ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the student analysis pipeline.')
+    parser.add_argument('--rows', nargs='+', type=lambda v: int(float(v)), default=DEFAULT_ROWS,
+                        help='roster sizes, e.g. 1e3 1e4 1e5 (up to 1e8)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--malformed-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=217)
+    parser.add_argument('--only', nargs='+', help='benchmark only these targets')
+    parser.add_argument('--data-dir', default=None, help='where generated rosters are kept (default: temp dir)')
+    parser.add_argument('--out', default=str(ROOT / 'benchmarks' / 'results' / 'latest.json'))
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args(argv)
+
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+        results = run(args.rows, args.repeat, args.malformed_rate, args.seed, args.data_dir, args.only)
+    else:
+        # Generated rosters can be gigabytes; without --data-dir they do not outlive the run
+        with tempfile.TemporaryDirectory(prefix='bench-data-') as data_dir:
+            results = run(args.rows, args.repeat, args.malformed_rate, args.seed, data_dir, args.only)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stats_backend': daf.active_stats_backend(),
+            'malformed_rate': args.malformed_rate,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic student rosters for benchmarking.
+
+Writes CSVs in the data/students.csv format (name,age,grade,subject) from
+10^3 up to 10^8 rows. The same arguments always produce the same bytes.
+A configurable fraction of rows is malformed: bad ages, bad grades, short
+rows and blank lines, in equal shares.
+
+Usage:
+    python benchmarks/synthetic_roster.py --rows 1000000 --out /tmp/roster.csv
+"""
+
+import argparse
+import random
+
+DEFAULT_SUBJECTS = ['Math', 'Science', 'History', 'English', 'Art', 'Music', 'Biology', 'Chemistry']
+FIRST_NAMES = ['Alice', 'George', 'Hannah', 'Jane', 'Gal', 'Ariel', 'Kathy', 'Omar', 'Priya', 'Mateo',
+               'Yuki', 'Noah', 'Zara', 'Liam', 'Sofia', 'Kwame', 'Ines', 'Ravi', 'Mina', 'Theo']
+
+
+def iter_roster_lines(rows, subjects=None, malformed_rate=0.0, seed=217):
+    """Yield CSV lines (with newline) for a header plus `rows` data rows."""
+    rng = random.Random(seed)
+    subjects = subjects or DEFAULT_SUBJECTS
+    yield 'name,age,grade,subject\n'
+    for i in range(rows):
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]}{i}"
+        age = str(rng.randint(13, 19))
+        grade = f"{min(100.0, max(0.0, rng.gauss(82, 10))):.1f}"
+        subject = subjects[rng.randrange(len(subjects))]
+        if malformed_rate and rng.random() < malformed_rate:
+            kind = rng.randrange(4)
+            if kind == 0:
+                age = 'unknown'
+            elif kind == 1:
+                grade = 'absent'
+            elif kind == 2:
+                yield f"{name},{age}\n"
+                continue
+            else:
+                yield '\n'
+                continue
+        yield f"{name},{age},{grade},{subject}\n"
+
+
+def write_roster(path, rows, subjects=None, malformed_rate=0.0, seed=217, batch=10000):
+    """Write a synthetic roster to `path` in batches; returns the path."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        buf = []
+        for line in iter_roster_lines(rows, subjects, malformed_rate, seed):
+            buf.append(line)
+            if len(buf) >= batch:
+                f.write(''.join(buf))
+                buf.clear()
+        f.write(''.join(buf))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=lambda v: int(float(v)), default=1000, help='data rows (e.g. 1e6)')
+    parser.add_argument('--out', required=True, help='output CSV path')
+    parser.add_argument('--subjects', default=','.join(DEFAULT_SUBJECTS), help='comma-separated subjects')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='fraction of malformed rows')
+    parser.add_argument('--seed', type=int, default=217)
+    args = parser.parse_args(argv)
+    write_roster(args.out, args.rows, args.subjects.split(','), args.malformed_rate, args.seed)
+    print(f"Wrote {args.rows} rows to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
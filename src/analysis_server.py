@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Resident analysis server: the roster stays parsed in memory between queries.
+
+A localhost HTTP service (JSON responses) that loads the roster once into
+a StudentTable with its StudentStats, per-subject GroupedStats and
+GradeIndex, then answers queries from those structures:
+
+    GET /analyze                           analyze_data() results
+    GET /top?threshold=90                  top performers (or ?k=10 for the best k)
+    GET /distribution[?subject=Math]       grade bucket counts
+    GET /percentile?p=90[&subject=Math]    interpolated grade percentile
+    GET /count?low=80&high=89[&subject=]   grades in an inclusive range
+    GET /subjects                          per-subject summary rows
+    GET /subject?name=Math                 one subject's summary
+    GET /health                            rows, file mtime, reload count
+
+Before each query the roster file is stat()ed; when its mtime or size
+changed the roster is reloaded and the response cache (keyed by path and
+query string) is cleared.
+
+Usage:
+    python src/analysis_server.py [--input data/students.csv] [--port 8217]
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from data_analysis_functions import (
+    CSV_PATH,
+    GroupedStats,
+    StudentStats,
+    StudentTable,
+    analyze_stats,
+    load_data,
+    top_k,
+    top_performers,
+)
+from instrumentation import configure_from_env, run_profiled
+
+DEFAULT_PORT = 8217
+CACHE_SIZE = 1024
+
+
+class QueryError(ValueError):
+    """Bad query parameters; reported to the client as HTTP 400."""
+
+
+def _number(params, name, default=None):
+    raw = params.get(name)
+    if raw is None:
+        if default is None:
+            raise QueryError(f"[ERROR] Missing query parameter: {name}")
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        raise QueryError(f"[ERROR] Query parameter {name} must be a number, got {raw!r}")
+
+
+def _student(s):
+    return {"name": s["name"], "age": s["age"], "grade": s["grade"], "subject": s["subject"]}
+
+
+class RosterService:
+    """The resident roster, its indexes and a per-query response cache."""
+
+    def __init__(self, file_path=CSV_PATH, cache_size=CACHE_SIZE):
+        self.file_path = file_path
+        self.cache_size = cache_size
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._signature = None
+        self._cache = {}
+        self._handlers = {
+            "/analyze": self._analyze,
+            "/top": self._top,
+            "/distribution": self._distribution,
+            "/percentile": self._percentile,
+            "/count": self._count,
+            "/subjects": self._subjects,
+            "/subject": self._subject,
+        }
+        self.refresh()
+
+    def _stat_signature(self):
+        st = os.stat(self.file_path)
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self):
+        """Reload the roster if the file changed since the last load; True if it did."""
+        try:
+            signature = self._stat_signature()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"[ERROR] File not found: {self.file_path}")
+        if signature == self._signature:
+            return False
+        # Built from the student dicts rather than StudentTable.from_csv so
+        # unparseable grades count as 0.0, exactly as in analyze_data()
+        table = StudentTable.from_students(load_data(self.file_path))
+        # Another writer may have touched the file while it was read; the
+        # next query then sees a new signature and reloads again
+        self.table = table
+        self.stats = StudentStats.from_students(table)
+        self.grouped = GroupedStats("subject").update(table)
+        self.index = table.grade_index(by_subject=True)
+        self.loaded_at = time.time()
+        self._signature = signature
+        self._cache.clear()
+        self.reloads += 1
+        return True
+
+    def query(self, path, params=None):
+        """Answer one query; returns the response body as JSON bytes."""
+        params = dict(params or {})
+        with self._lock:
+            self.refresh()
+            if path == "/health":
+                return self._encode(self._health())
+            handler = self._handlers.get(path)
+            if handler is None:
+                raise KeyError(path)
+            key = (path, tuple(sorted(params.items())))
+            body = self._cache.get(key)
+            if body is None:
+                body = self._encode(handler(params))
+                if len(self._cache) >= self.cache_size:
+                    del self._cache[next(iter(self._cache))]  # oldest entry
+                self._cache[key] = body
+            return body
+
+    @staticmethod
+    def _encode(result):
+        return json.dumps(result).encode("utf-8")
+
+    def _index_for(self, params):
+        subject = params.get("subject")
+        return self.index if subject is None else self.index.for_subject(subject)
+
+    def _health(self):
+        return {
+            "file": self.file_path,
+            "rows": len(self.table),
+            "mtime_ns": self._signature[0],
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "cached_queries": len(self._cache),
+        }
+
+    def _analyze(self, params):
+        return analyze_stats(self.stats)
+
+    def _top(self, params):
+        if "k" in params:
+            k = _number(params, "k")
+            if not (math.isfinite(k) and k >= 0):
+                raise QueryError(f"[ERROR] k must be a non-negative number, got {params['k']!r}")
+            k = int(k)
+            return [_student(s) for s in top_k(self.table, k, ties=params.get("ties") == "1")]
+        threshold = _number(params, "threshold", 90)
+        return [_student(s) for s in top_performers(self.table, threshold)]
+
+    def _distribution(self, params):
+        return self._index_for(params).bucket_counts()
+
+    def _percentile(self, params):
+        p = _number(params, "p")
+        if not 0 <= p <= 100:
+            raise QueryError(f"[ERROR] Percentile must be between 0 and 100, got {p}")
+        return {"p": p, "grade": self._index_for(params).percentile(p)}
+
+    def _count(self, params):
+        low = _number(params, "low") if "low" in params else None
+        high = _number(params, "high") if "high" in params else None
+        return {"low": low, "high": high, "count": self._index_for(params).count_range(low, high)}
+
+    def _subjects(self, params):
+        return self.grouped.rows()
+
+    def _subject(self, params):
+        name = params.get("name")
+        if name is None:
+            raise QueryError("[ERROR] Missing query parameter: name")
+        for row in self.grouped.rows():
+            if row["key"] == name:
+                return row
+        raise KeyError(name)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            body = self.service.query(url.path, parse_qsl(url.query))
+            status = 200
+        except KeyError as e:
+            status, body = 404, json.dumps({"error": f"Not found: {e.args[0]}"}).encode("utf-8")
+        except QueryError as e:
+            status, body = 400, json.dumps({"error": str(e)}).encode("utf-8")
+        except FileNotFoundError as e:
+            status, body = 503, json.dumps({"error": str(e)}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # queries are high-volume; keep the console quiet
+
+
+def make_server(file_path=CSV_PATH, host="127.0.0.1", port=DEFAULT_PORT):
+    """Build (but do not start) the HTTP server; port=0 picks a free port."""
+    handler = type("RosterHandler", (_Handler,), {"service": RosterService(file_path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve roster queries from memory over localhost HTTP.")
+    parser.add_argument("--input", default=CSV_PATH, help="CSV or .stcol roster")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-stage timings as JSON when the server stops")
+    args = parser.parse_args(argv)
+    configure_from_env(sys.argv[1:] if argv is None else argv)
+
+    server = make_server(args.input, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Serving {args.input} on http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    run_profiled(main)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Asyncio pipeline that overlaps reading, parsing and report writing.
+
+A reader thread pulls fixed-size byte chunks from the CSV into a bounded
+queue (so a slow consumer applies backpressure to the reader instead of
+buffering the whole file). The parser stage decodes each chunk as it
+arrives and folds complete rows into a StudentStats while the next chunk
+is being read. Once input ends, analysis_report.txt and
+analysis_modular_report.txt are rendered concurrently on worker threads.
+
+Row handling is identical to load_students, so the reports match main().
+
+Usage:
+    python src/async_pipeline.py
+"""
+import asyncio
+import codecs
+import io
+import sys
+import threading
+
+from data_analysis_functions import (
+    CSV_PATH,
+    StudentStats,
+    _parse_student_row,
+    format_report,
+    generate_detailed_report,
+    save_report,
+)
+from instrumentation import configure_from_env, run_profiled
+
+CHUNK_SIZE = 1 << 20
+QUEUE_SIZE = 4
+_EOF = None
+
+
+def _read_chunks(file_path, chunk_size, queue, loop, stop):
+    """Reader thread: push byte chunks onto the queue, blocking while it is full.
+
+    `stop` is checked between chunks, so a consumer that gives up early
+    (e.g. on a parse error) ends the thread instead of leaving it blocked.
+    """
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    try:
+        with open(file_path, "rb") as f:
+            while not stop.is_set():
+                chunk = f.read(chunk_size)
+                put(chunk or _EOF)
+                if not chunk:
+                    return
+    except BaseException as e:
+        if not stop.is_set():
+            put(e)
+        raise
+
+
+class _RowParser:
+    """Incrementally turns decoded text into student dicts, carrying partial lines."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._carry = ""
+        self._header_seen = False
+
+    def feed(self, chunk, final=False):
+        text = self._carry + self._decoder.decode(chunk, final=final)
+        # StringIO(newline="") splits lines exactly like open(..., newline="")
+        lines = io.StringIO(text, newline="").readlines()
+        self._carry = ""
+        if lines and not final and not lines[-1].endswith(("\n", "\r")):
+            self._carry = lines.pop()
+        students = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if not self._header_seen:
+                self._header_seen = True
+                continue
+            student = _parse_student_row(line)
+            if student is not None:
+                students.append(student)
+        return students
+
+
+async def load_and_aggregate(file_path=CSV_PATH, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+    """Read and parse the CSV concurrently; return (students, StudentStats)."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    reader = loop.run_in_executor(None, _read_chunks, file_path, chunk_size, queue, loop, stop)
+
+    parser = _RowParser()
+    stats = StudentStats()
+    students = []
+    try:
+        while True:
+            chunk = await queue.get()
+            if isinstance(chunk, BaseException):
+                if isinstance(chunk, FileNotFoundError):
+                    raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+                raise chunk
+            rows = parser.feed(chunk or b"", final=chunk is _EOF)
+            stats.update(rows)
+            students.extend(rows)
+            if chunk is _EOF:
+                break
+    finally:
+        # Stop the reader however the loop ended; emptying the queue releases a
+        # put it may be blocked in, so it gets back to checking `stop`
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        await asyncio.gather(reader, return_exceptions=True)
+    return students, stats
+
+
+async def run_pipeline(file_path=CSV_PATH,
+                       report_path="output/analysis_report.txt",
+                       detailed_path="output/analysis_modular_report.txt",
+                       chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+    """Load the roster and write both reports, with the two writes running concurrently."""
+    students, stats = await load_and_aggregate(file_path, chunk_size, queue_size)
+    if not students:
+        print(f"No data loaded. Please check {file_path}")
+        return stats
+
+    await asyncio.gather(
+        asyncio.to_thread(save_report, format_report(stats), report_path),
+        asyncio.to_thread(generate_detailed_report, students, detailed_path, stats),
+    )
+    print(f"Report written to {report_path}")
+    return stats
+
+
+def main(argv=None):
+    configure_from_env(sys.argv[1:] if argv is None else argv)
+    asyncio.run(run_pipeline())
+
+
+if __name__ == "__main__":
+    run_profiled(main)
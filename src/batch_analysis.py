@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Batch analysis of many roster CSVs (e.g. one per school).
+
+Every file matched by a directory or glob is analyzed in a process pool:
+each worker streams its file once into a StudentStats, writes that
+file's report through save_report (under OUT_DIR/files/, so no input
+name can clash with the combined reports in OUT_DIR), and sends the
+StudentStats back. The per-file partials are merged (in sorted path
+order, so ties list names deterministically) into one global
+analyze_data-style result without re-reading any file.
+
+The exit status is non-zero when nothing matched or any file failed.
+
+Usage:
+    python src/batch_analysis.py "data/schools/*.csv" --workers 8 --out-dir output/batch
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import glob
+import os
+import sys
+import time
+
+from data_analysis_functions import StudentStats, analyze_stats, format_report, iter_students, save_report, save_results
+from instrumentation import configure_from_env, run_profiled, stage
+
+# Per-file reports go in this subdirectory of out_dir; the combined ones sit beside it
+FILE_REPORT_DIR = "files"
+
+
+def find_roster_files(target):
+    """CSV files in a directory (non-recursive), or the files matching a glob pattern."""
+    if os.path.isdir(target):
+        pattern = os.path.join(target, "*.csv")
+    else:
+        pattern = target
+    return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+
+def _report_paths(files, out_dir):
+    """One report path per input file, suffixing repeated file names so none collide."""
+    out_dir = os.path.join(out_dir, FILE_REPORT_DIR)
+    seen = {}
+    paths = []
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        n = seen.get(stem, 0)
+        seen[stem] = n + 1
+        name = f"{stem}_report.txt" if n == 0 else f"{stem}_{n}_report.txt"
+        paths.append(os.path.join(out_dir, name))
+    return paths
+
+
+def analyze_file(path, report_path=None):
+    """Worker: stream one CSV into a StudentStats and optionally save its report."""
+    stats = StudentStats().update(iter_students(path))
+    if report_path:
+        save_report(format_report(stats), report_path)
+    return stats
+
+
+@stage("run_batch")
+def run_batch(target, out_dir="output/batch", workers=None, write_reports=True, progress=True):
+    """Analyze every roster in `target`; return a dict with per-file and merged results.
+
+    `workers` caps the number of concurrent processes (default: CPU count).
+    Files that fail to parse are listed under 'failed' and left out of the merge.
+    """
+    files = find_roster_files(target)
+    report_paths = _report_paths(files, out_dir) if write_reports else [None] * len(files)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+
+    started = time.perf_counter()
+    per_file = {}
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(analyze_file, path, report_path): path
+            for path, report_path in zip(files, report_paths)
+        }
+        for done, fut in enumerate(as_completed(futures), 1):
+            path = futures[fut]
+            try:
+                per_file[path] = fut.result()
+            except Exception as e:
+                failed[path] = str(e)
+            if progress:
+                print(f"[{done}/{len(files)}] {path}" + (" FAILED" if path in failed else ""))
+
+    merged = StudentStats()
+    for path in files:
+        if path in per_file:
+            merged.merge(per_file[path])
+    elapsed = time.perf_counter() - started
+
+    if progress:
+        rate = merged.count / elapsed if elapsed else 0.0
+        print(f"Analyzed {len(per_file)} of {len(files)} files ({len(failed)} failed), "
+              f"{merged.count} students in {elapsed:.2f}s ({rate:,.0f} rows/sec) with {workers} workers")
+    return {
+        "files": files,
+        "per_file": per_file,
+        "failed": failed,
+        "stats": merged,
+        "results": analyze_stats(merged),
+        "seconds": elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze many roster CSVs in parallel.")
+    parser.add_argument("target", help="directory of CSV files or a glob pattern")
+    parser.add_argument("--workers", type=int, default=None, help="max concurrent processes")
+    parser.add_argument("--out-dir", default="output/batch",
+                        help=f"where the combined reports are written (per-file ones go in {FILE_REPORT_DIR}/)")
+    parser.add_argument("--profile", action="store_true", help="print per-stage timings as JSON at exit")
+    args = parser.parse_args(argv)
+    configure_from_env(sys.argv[1:] if argv is None else argv)
+
+    batch = run_batch(args.target, args.out_dir, args.workers)
+    if not batch["files"]:
+        print(f"[ERROR] No CSV files found for {args.target}", file=sys.stderr)
+        return 1
+    save_report(format_report(batch["stats"]), os.path.join(args.out_dir, "combined_report.txt"))
+    save_results(batch["results"], os.path.join(args.out_dir, "combined_results.txt"))
+    print(f"Combined report written to {os.path.join(args.out_dir, 'combined_report.txt')}")
+    for path, error in batch["failed"].items():
+        print(f"[ERROR] {path}: {error}", file=sys.stderr)
+    return 1 if batch["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_profiled(main))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Compact binary columnar files for parsed rosters (.stcol).
+
+Layout (all integers little-endian):
+
+    8 bytes   magic  b"STCOL\\x00\\x01\\x00"
+    4 bytes   header length H
+    H bytes   JSON header: row count, one entry per column (name, dtype,
+              byte offset, byte length), the subject dictionary, and the
+              analyze_data() results saved alongside the data
+    ...       column blocks, each starting on an 8-byte boundary:
+              age <i8, age_mask u1, grade <f8, grade_mask u1,
+              subject <u4 (codes into the subject dictionary),
+              names (UTF-8, newline separated)
+
+Loading memory-maps the file and copies each column block into its typed
+array in one bulk operation - there is no per-row parsing. load_data()
+recognises these files by extension or magic bytes.
+"""
+from array import array
+import json
+import mmap
+import os
+import sys
+
+from data_analysis_functions import StudentTable, analyze_data
+
+MAGIC = b"STCOL\x00\x01\x00"
+EXTENSION = ".stcol"
+FORMAT_VERSION = 1
+
+# (column name, StudentTable attribute, header dtype, array typecode)
+_COLUMNS = [
+    ("age", "ages", "<i8", "q"),
+    ("age_mask", "age_mask", "u1", "B"),
+    ("grade", "grades", "<f8", "d"),
+    ("grade_mask", "grade_mask", "u1", "B"),
+    ("subject", "subject_codes", "<u4", "I"),
+]
+
+
+def _le_bytes(values):
+    """Raw little-endian bytes of an array.array."""
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pad(n):
+    return (-n) % 8
+
+
+def is_columnar_file(path):
+    """True if path has the .stcol extension or starts with the format's magic bytes."""
+    if str(path).endswith(EXTENSION):
+        return True
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def save_columnar(students, path, results=None):
+    """Write students (list of dicts or StudentTable) plus analyze_data results to path."""
+    table = students if isinstance(students, StudentTable) else StudentTable.from_students(students)
+    if results is None:
+        results = analyze_data(table)
+    if any("\n" in name for name in table.names):
+        raise ValueError("[ERROR] Student names may not contain newlines in the columnar format")
+
+    blocks = [(name, dtype, _le_bytes(getattr(table, attr))) for name, attr, dtype, _ in _COLUMNS]
+    blocks.append(("names", "utf-8", "\n".join(table.names).encode("utf-8")))
+
+    # The header stores offsets, so size it first with placeholder offsets of the final width
+    columns = [{"name": name, "dtype": dtype, "offset": 0, "nbytes": len(data)} for name, dtype, data in blocks]
+    header = {"version": FORMAT_VERSION, "rows": len(table), "subjects": table.subjects,
+              "columns": columns, "results": results}
+    for col in columns:
+        col["offset"] = 10 ** 15  # widest offset we will ever write
+    data_start = len(MAGIC) + 4 + len(json.dumps(header).encode("utf-8"))
+    data_start += _pad(data_start)
+
+    offset = data_start
+    for col in columns:
+        col["offset"] = offset
+        offset += col["nbytes"] + _pad(col["nbytes"])
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (data_start - len(MAGIC) - 4 - len(header_bytes))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(4, "little"))
+        f.write(header_bytes)
+        for _, _, data in blocks:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+    os.replace(tmp, path)
+    return path
+
+
+def load_columnar(path):
+    """Memory-map a .stcol file and return (StudentTable, saved results dict)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"[ERROR] Not a columnar roster file: {path}")
+        header_len = int.from_bytes(mm[len(MAGIC):len(MAGIC) + 4], "little")
+        header = json.loads(mm[len(MAGIC) + 4:len(MAGIC) + 4 + header_len])
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"[ERROR] Unsupported columnar format version: {header.get('version')}")
+        columns = {col["name"]: col for col in header["columns"]}
+
+        table = StudentTable()
+        view = memoryview(mm)
+        try:
+            for name, attr, _, typecode in _COLUMNS:
+                col = columns[name]
+                values = array(typecode)
+                values.frombytes(view[col["offset"]:col["offset"] + col["nbytes"]])
+                if sys.byteorder == "big" and values.itemsize > 1:
+                    values.byteswap()
+                setattr(table, attr, values)
+            col = columns["names"]
+            names = bytes(view[col["offset"]:col["offset"] + col["nbytes"]]).decode("utf-8")
+        finally:
+            view.release()
+
+    table.names = names.split("\n") if header["rows"] else []
+    table.subjects = header["subjects"]
+    table._subject_index = {subj: code for code, subj in enumerate(table.subjects)}
+    return table, header["results"]
@@ -1,119 +1,159 @@
-# data_analysis.py
-# TODO: implement main entry point
-
-def main():
-    # TODO: implement program logic
-    pass
-
-if __name__ == "__main__":
-    main()
-
 #!/usr/bin/env python3
 """
 Student Grade Analysis - Function Version
+
+This is also the command-line entry point:
+
+    python src/data_analysis.py                  # same as `report`
+    python src/data_analysis.py report [--stats-only] [--input CSV] [--output FILE]
+    python src/data_analysis.py detailed [--input CSV] [--output FILE]
+    python src/data_analysis.py stats [--stats-only] [--input CSV]
+    python src/data_analysis.py batch DIR_OR_GLOB [--workers N] [--out-dir DIR]
+    python src/data_analysis.py diff OLD.csv NEW.csv [--key name] [--output FILE]
+    python src/data_analysis.py --profile stats  # per-stage timings as JSON on stderr
+
+It runs from cron and shell pipelines many times an hour, so startup is
+kept short: only os, sys and the small instrumentation module are
+imported at load time, and each subcommand imports the analysis library,
+argparse, the mmap scanner or the batch runner when it actually runs.
+NumPy is loaded by the stats backend on first use. With --stats-only the aggregates are computed from
+the mapped file bytes without building a dict per student. --input also
+accepts binary .stcol rosters (see columnar_format).
 """
 
 import os
+import sys
+
+from instrumentation import configure_from_env, run_profiled, stage
 
 # Use a relative path so scripts work on CI and across platforms
 CSV_PATH = "data/students.csv"
+REPORT_PATH = "output/analysis_report.txt"
+DETAILED_PATH = "output/analysis_modular_report.txt"
 
-def load_students(file_path):
-    """Read CSV using open() + readlines(), split by commas, return list of student dicts."""
+def _parse_student_row(line):
+    """Split one stripped CSV line into a student dict, or None if the row is short."""
+    parts = [p.strip() for p in line.split(",")]
+    if len(parts) < 4:
+        return None
+    name, age_s, grade_s, subject = parts[:4]
+
+    try:
+        age = int(age_s)
+    except ValueError:
+        age = None
+    try:
+        grade = float(grade_s)
+    except ValueError:
+        grade = 0.0
+    return {"name": name, "age": age, "grade": grade, "subject": subject}
+
+
+def iter_students(file_path, chunk_size=1 << 16):
+    """Yield student dicts one row at a time; reads the file in chunk_size-byte blocks."""
     try:
-        with open(file_path, "r", encoding="utf-8", newline="") as f:
-            lines = f.readlines()
+        f = open(file_path, "r", encoding="utf-8", newline="", buffering=chunk_size)
     except FileNotFoundError:
         raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
 
-    # Remove blanks, keep header, skip it later
-    lines = [ln.strip() for ln in lines if ln.strip()]
-    if not lines:
-        return []
-
-    students = []
-    for line in lines[1:]:  
-        parts = [p.strip() for p in line.split(",")]
-        if len(parts) < 4:
-            continue
-        name, age_s, grade_s, subject = parts[:4]
-
-        try:
-            age = int(age_s)
-        except ValueError:
-            age = None
-        try:
-            grade = float(grade_s)
-        except ValueError:
-            grade = 0.0
-        students.append({"name": name, "age": age, "grade": grade, "subject": subject})
-    return students
+    with f:
+        header_seen = False
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            # First non-blank line is the header
+            if not header_seen:
+                header_seen = True
+                continue
+            student = _parse_student_row(line)
+            if student is not None:
+                yield student
 
 
-def calculate_average_grade(students):
-    """Return average grade as a float; uses only numeric grades."""
-    grades = [s["grade"] for s in students if isinstance(s.get("grade"), (int, float))]
-    if not grades:
+def load_students(file_path):
+    """Return the full list of student dicts; see iter_students for a streaming version."""
+    return list(iter_students(file_path))
+
+
+def _mean_of(students, key):
+    """Running mean of the numeric `key` field over any iterable of student dicts."""
+    total = 0
+    count = 0
+    for s in students:
+        value = s.get(key)
+        if isinstance(value, (int, float)):
+            total += value
+            count += 1
+    if not count:
         return 0.0
-    return sum(grades) / len(grades)
+    return total / count
+
+
+def calculate_average_grade(students):
+    """Return average grade as a float; uses only numeric grades. Accepts any iterable."""
+    return _mean_of(students, "grade")
+
 
 def calculate_average_age(students):
-    """Return average age as a float; uses only numeric grades."""
-    ages = [s["age"] for s in students if isinstance(s.get("age"), (int, float))]
-    if not ages:
-        return 0.0
-    return sum(ages) / len(ages)
+    """Return average age as a float; uses only numeric ages. Accepts any iterable."""
+    return _mean_of(students, "age")
 
 
 def count_math_students(students):
     """Count students whose subject is Math (case-insensitive)."""
     return sum(1 for s in students if str(s.get("subject", "")).strip().lower() == "math")
 
+
 def find_highest_grade(students):
-    grades = [s["grade"] for s in students if isinstance(s.get("grade"), (int, float))]
-    if not grades:
-        return 0.0
-    return max(grades) if grades else 0.0   
-
-
-def generate_report():
-    """Create the formatted report string."""
-    students = load_students(CSV_PATH)
-    total_students = len(students)
-    average = calculate_average_grade(students)
-    age_average = calculate_average_age(students)
-    math_count = count_math_students(students)
-    highest_grade = find_highest_grade(students)
-
-    # Who has the highest grade?
-    top_students = [
-        s["name"]
-        for s in students
-        if isinstance(s.get("grade"), (int, float)) and s["grade"] == highest_grade
-    ]
-
-    # Count students by subject (all subjects)
-    by_subject = {}
+    """Return the highest numeric grade, or 0.0 if there are none. Accepts any iterable."""
+    highest = None
     for s in students:
-        subj = (s.get("subject") or "Unknown").strip() or "Unknown"
-        by_subject[subj] = by_subject.get(subj, 0) + 1
+        grade = s.get("grade")
+        if isinstance(grade, (int, float)) and (highest is None or grade > highest):
+            highest = grade
+    if highest is None:
+        return 0.0
+    return highest
+
+
+def _validated_students(file_path, policy):
+    """Stream students through the validating parser; its summary goes to stderr at the end."""
+    import data_analysis_functions as daf
+
+    summary = daf.ValidationSummary(policy)
+    yield from daf.iter_students(file_path, policy=policy, summary=summary)
+    print(summary.format(), end="", file=sys.stderr)
+
+
+@stage("load_stats")
+def _load_stats(file_path, stats_only=False, policy=None, moments=True):
+    """StudentStats for a CSV or .stcol roster; stats_only never builds per-student dicts.
+
+    moments=False skips the variance/std dev accumulators the summary report does not print.
+    """
+    from columnar_format import is_columnar_file, load_columnar
+    from data_analysis_functions import StudentStats
 
-    lines = []
-    lines.append("Student Analysis Report")
-    lines.append("=" * 30)
-    lines.append(f"Total students: {total_students}")
-    lines.append(f"Average grade: {average:.1f}")   # .1f formatting as required
-    lines.append(f"Average age: {age_average:.1f}")
-    lines.append(f"Highest grade: {highest_grade:.1f} (by: {', '.join(top_students) if top_students else 'N/A'})")
-    lines.append(f"Math students: {math_count}")
-    lines.append("")
-    lines.append("Counts by subject:")
-    for subj in sorted(by_subject.keys()):
-        lines.append(f"  {subj}: {by_subject[subj]}")
-    return "\n".join(lines)
+    if is_columnar_file(file_path):
+        return StudentStats(moments).update(load_columnar(file_path)[0])
+    if policy:
+        return StudentStats(moments).update(_validated_students(file_path, policy))
+    if stats_only:
+        from mmap_scanner import scan_stats
+        return scan_stats(file_path, moments)
+    return StudentStats(moments).update(iter_students(file_path))
 
 
+@stage("generate_report")
+def generate_report(file_path=CSV_PATH, stats_only=False, policy=None):
+    """Create the formatted report string in one streaming pass over the roster."""
+    from data_analysis_functions import format_report
 
+    return format_report(_load_stats(file_path, stats_only, policy, moments=False))
+
+
+@stage("save_report")
 def save_report(report, filename):
     out_dir = os.path.dirname(filename) or "."
     os.makedirs(out_dir, exist_ok=True)
@@ -121,11 +161,157 @@ def save_report(report, filename):
         f.write(report)
 
 
+def _run_report(args):
+    save_report(generate_report(args.input, args.stats_only, args.policy), args.output)
+    print(f"Report written to {args.output}")
+
+
+class _RosterFile:
+    """Re-iterable CSV roster: each pass streams the file again instead of keeping a list."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def __iter__(self):
+        return iter_students(self.file_path)
+
+    def __bool__(self):
+        return next(iter(self), None) is not None
+
+
+def _run_detailed(args):
+    from columnar_format import is_columnar_file
+    from data_analysis_functions import generate_detailed_report, load_data
+
+    if args.policy and not is_columnar_file(args.input):
+        students = list(_validated_students(args.input, args.policy))
+    elif args.order and not is_columnar_file(args.input):
+        # Sorted output goes through the external sort, so the roster need not fit in memory
+        students = _RosterFile(args.input)
+    else:
+        students = load_data(args.input)
+    if not generate_detailed_report(students, args.output, order=args.order, memory_budget=args.memory_budget):
+        return 1
+
+
+def _run_stats(args):
+    import json
+
+    from columnar_format import is_columnar_file, load_columnar
+    from data_analysis_functions import analyze_stats
+
+    if args.stats_only and is_columnar_file(args.input):
+        results = load_columnar(args.input)[1]  # saved with the roster, nothing to recompute
+    else:
+        results = analyze_stats(_load_stats(args.input, args.stats_only, args.policy))
+    print(json.dumps(results, indent=2))
+
+
+def _global_parser():
+    """Options that go before the subcommand (batch and diff included)."""
+    import argparse
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--backend", choices=("auto", "numpy", "python"),
+                        help="statistics backend (default: NumPy when installed)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-stage timings and memory as JSON to stderr at exit "
+                             "(same as STUDENT_PROFILE=1)")
+    return parser
+
+
+def _split_global_options(argv):
+    """(global options, subcommand and its arguments) for a command line."""
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--profile" or argv[i].startswith("--backend="):
+            i += 1
+        elif argv[i] == "--backend":
+            i += 2
+        else:
+            break
+    return argv[:i], argv[i:]
+
+
+def _set_backend(args):
+    if args.backend:
+        from data_analysis_functions import set_stats_backend
+        set_stats_backend(args.backend)
+
+
+def _build_parser():
+    import argparse
+
+    from external_sort import parse_size
+
+    parser = argparse.ArgumentParser(description="Student grade analysis.", parents=[_global_parser()])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help=f"write the summary report (default: {REPORT_PATH})")
+    report.add_argument("--output", default=REPORT_PATH)
+    detailed = commands.add_parser("detailed", help=f"write the detailed report (default: {DETAILED_PATH})")
+    detailed.add_argument("--output", default=DETAILED_PATH)
+    detailed.add_argument("--order", choices=("grade", "name", "subject"),
+                          help="sort the individual records (grade: highest first)")
+    detailed.add_argument("--memory-budget", type=parse_size, default=None,
+                          help="memory for sorting before spilling runs to disk, e.g. 256M (default: 64M)")
+    stats = commands.add_parser("stats", help="print analyze_data() results as JSON")
+    for sub, func in ((report, _run_report), (detailed, _run_detailed), (stats, _run_stats)):
+        sub.add_argument("--input", default=CSV_PATH, help="CSV or .stcol roster")
+        # Also accepted after the subcommand; run_cli has already acted on it either way
+        sub.add_argument("--profile", action="store_true", default=argparse.SUPPRESS,
+                         help="same as the global --profile")
+        sub.add_argument("--policy", choices=("coerce", "skip", "fail"),
+                         help="validate rows (bad values: coerce, skip the row, or fail); "
+                              "a validation summary is printed to stderr")
+        sub.set_defaults(func=func)
+    for sub in (report, stats):
+        sub.add_argument("--stats-only", action="store_true",
+                         help="aggregate straight from the file without per-student dicts")
+    # Parsed by batch_analysis / roster_diff themselves; listed here for --help
+    commands.add_parser("batch", help="analyze a directory or glob of roster CSVs", add_help=False)
+    commands.add_parser("diff", help="report what changed between two roster snapshots", add_help=False)
+    return parser
+
+
+def _dispatch(argv):
+    options, command = _split_global_options(argv)
+    if not command and all(opt == "--profile" for opt in options):  # --profile is applied by run_cli
+        # Fast path for the plain `python src/data_analysis.py` run: no argparse
+        save_report(generate_report(), REPORT_PATH)
+        print(f"Report written to {REPORT_PATH}")
+        return 0
+    if command[:1] == ["batch"]:
+        _set_backend(_global_parser().parse_args(options))
+        from batch_analysis import main as batch_main
+        return batch_main(command[1:])
+    if command[:1] == ["diff"]:
+        _set_backend(_global_parser().parse_args(options))
+        from roster_diff import main as diff_main
+        return diff_main(command[1:])
+
+    args = _build_parser().parse_args(argv)
+    _set_backend(args)
+    return args.func(args)
+
+
+def run_cli(argv):
+    """Run one CLI invocation; returns the process exit status (None means 0)."""
+    configure_from_env(argv)
+    try:
+        return run_profiled(_dispatch, argv)
+    except (FileNotFoundError, ValueError) as e:  # ValueError covers RowValidationError
+        print(e, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader (e.g. `| head`) went away; exit quietly like other filters
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
 def main():
-    report = generate_report()
-    save_report(report, "output/analysis_report.txt")
-    print("Report written to output/analysis_report.txt")
+    return run_cli(sys.argv[1:])
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -5,34 +5,400 @@ This single file contains the advanced analysis implementation plus the
 compatibility wrapper functions expected by the tests: load_data,
 analyze_data, save_results, and a main() entrypoint.
 """
-from pathlib import Path
+from array import array
 import os
-import datetime
+import heapq
+import bisect
+import itertools
+import math
+import stat
+import sys
+
+from instrumentation import configure_from_env, run_profiled, stage
+
+# NumPy is optional (array.array is used without it) and is imported on
+# first use by _load_numpy(), so commands that never reach the NumPy
+# backend do not pay its import time
+np = None
+_numpy_checked = False
 
 CSV_PATH = "data/students.csv"
 
 # --- Basic data loading and helpers (from data_analysis) ---
 
-def load_students(file_path=CSV_PATH):
-    """Read CSV using open() + readlines(), split by commas, return list of student dicts."""
+def _split_student_row(line):
+    """Return the four stripped fields of a CSV line, or None if the row is short."""
+    parts = [p.strip() for p in line.split(",")]
+    if len(parts) < 4:
+        return None
+    return parts[:4]
+
+
+def _parse_student_row(line):
+    """Split one stripped CSV line into a student dict, or None if the row is short."""
+    fields = _split_student_row(line)
+    if fields is None:
+        return None
+    name, age_s, grade_s, subject = fields
+
     try:
-        with open(file_path, "r", encoding="utf-8", newline="") as f:
-            lines = f.readlines()
+        age = int(age_s)
+    except ValueError:
+        age = None
+    try:
+        grade = float(grade_s)
+    except ValueError:
+        grade = 0.0
+    return {"name": name, "age": age, "grade": grade, "subject": subject}
+
+
+def _iter_data_lines(file_path, chunk_size):
+    """Yield stripped, non-blank CSV lines after the header."""
+    try:
+        f = open(file_path, "r", encoding="utf-8", newline="", buffering=chunk_size)
     except FileNotFoundError:
         raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
 
-    # Remove blanks, keep header, skip it later
-    lines = [ln.strip() for ln in lines if ln.strip()]
-    if not lines:
-        return []
+    with f:
+        header_seen = False
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            # First non-blank line is the header
+            if not header_seen:
+                header_seen = True
+                continue
+            yield line
+
+
+PARSE_POLICIES = ("coerce", "skip", "fail")
+
+
+class RowValidationError(ValueError):
+    """A data row failed validation under the "fail" policy."""
+
+
+class ValidationSummary:
+    """Counts of accepted, coerced and rejected rows from a validating parse.
+
+    Rejections are counted per row (one reason each: "short row", "bad age"
+    or "bad grade"); coercions per replaced value ("age" -> None, "grade"
+    -> 0.0). The first MAX_SAMPLES problems are kept with their line
+    numbers so a report can point at them.
+    """
+
+    MAX_SAMPLES = 20
 
-    students = []
-    for line in lines[1:]:
-        parts = [p.strip() for p in line.split(",")]
-        if len(parts) < 4:
+    def __init__(self, policy="coerce"):
+        self.policy = policy
+        self.accepted = 0
+        self.quoted = 0  # rows that needed the RFC 4180 path
+        self.rejected = {}
+        self.coerced = {}
+        self.samples = []
+
+    @property
+    def rows(self):
+        return self.accepted + sum(self.rejected.values())
+
+    @property
+    def clean(self):
+        return not self.rejected and not self.coerced
+
+    def _note(self, counts, key, line_no, problem):
+        counts[key] = counts.get(key, 0) + 1
+        if len(self.samples) < self.MAX_SAMPLES:
+            self.samples.append((line_no, problem))
+
+    def to_dict(self):
+        return {
+            "policy": self.policy,
+            "rows": self.rows,
+            "accepted": self.accepted,
+            "quoted": self.quoted,
+            "rejected": dict(self.rejected),
+            "coerced": dict(self.coerced),
+            "samples": [list(sample) for sample in self.samples],
+        }
+
+    def format(self):
+        """Short plain-text summary in the style of the reports."""
+        lines = [
+            f"Validation ({self.policy}): {self.rows} rows, {self.accepted} accepted, "
+            f"{sum(self.rejected.values())} rejected, {sum(self.coerced.values())} values coerced",
+        ]
+        lines += [f"  rejected ({reason}): {n}" for reason, n in sorted(self.rejected.items())]
+        lines += [f"  coerced ({field}): {n}" for field, n in sorted(self.coerced.items())]
+        lines += [f"  line {line_no}: {problem}" for line_no, problem in self.samples]
+        return "\n".join(lines) + "\n"
+
+
+# Most physical lines one quoted record may span before it counts as malformed
+MAX_RECORD_LINES = 10
+
+
+def _split_quoted(text):
+    """RFC 4180 split of one (possibly multi-line) record; only used when it contains quotes."""
+    import csv  # deferred: clean files never need it
+
+    try:
+        return next(csv.reader([text], skipinitialspace=True), [])
+    except csv.Error as e:
+        raise ValueError(str(e))
+
+
+def _ends_in_quoted_field(text):
+    """True if text stops inside an open quoted field.
+
+    As in RFC 4180 a quote only opens a field at its start (after optional
+    spaces); a stray quote inside an unquoted field such as Jo"Jo is literal.
+    """
+    in_quotes = False
+    field_start = True
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if in_quotes:
+            if c == '"':
+                if text[i + 1:i + 2] == '"':
+                    i += 1  # escaped quote
+                else:
+                    in_quotes = False
+        elif c == ",":
+            field_start = True
+        elif field_start and c == '"':
+            in_quotes = True
+            field_start = False
+        elif c not in " \t":
+            field_start = False
+        i += 1
+    return in_quotes
+
+
+def _iter_validated(file_path, chunk_size, policy, summary):
+    try:
+        f = open(file_path, "r", encoding="utf-8", newline="", buffering=chunk_size)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+
+    def problem(counts, key, line_no, message):
+        if policy == "fail":
+            raise RowValidationError(f"[ERROR] {file_path}, line {line_no}: {message}")
+        summary._note(counts, key, line_no, message)
+
+    with f:
+        header_seen = False
+        lines = enumerate(f, 1)
+        pushed_back = []
+        while True:
+            item = pushed_back.pop() if pushed_back else next(lines, None)
+            if item is None:
+                break
+            line_no, line = item
+            line = line.strip()
+            if not line:
+                continue
+            if '"' in line:
+                # A quoted field may contain newlines: read on while one is still open
+                extra = []
+                record = line
+                while _ends_in_quoted_field(record) and len(extra) < MAX_RECORD_LINES - 1:
+                    more = pushed_back.pop() if pushed_back else next(lines, None)
+                    if more is None:
+                        break
+                    extra.append(more)
+                    record += "\n" + more[1].rstrip("\r\n")
+                unterminated = _ends_in_quoted_field(record)
+                if unterminated:
+                    # Never closed: keep just this line and re-read the ones borrowed after it
+                    pushed_back.extend(reversed(extra))
+                if not header_seen:
+                    header_seen = True
+                    continue
+                summary.quoted += 1
+                if unterminated:
+                    problem(summary.rejected, "malformed quotes", line_no, "unterminated quoted field")
+                    continue
+                try:
+                    parts = _split_quoted(record)
+                except ValueError as e:
+                    problem(summary.rejected, "malformed quotes", line_no, str(e))
+                    continue
+            else:
+                if not header_seen:
+                    header_seen = True
+                    continue
+                parts = line.split(",")
+            if len(parts) < 4:
+                problem(summary.rejected, "short row", line_no, f"expected 4 fields, got {len(parts)}")
+                continue
+
+            age_s = parts[1].strip()
+            grade_s = parts[2].strip()
+            try:
+                age = int(age_s)
+            except ValueError:
+                message = f"age {age_s!r} is not an integer"
+                if policy != "coerce":
+                    problem(summary.rejected, "bad age", line_no, message)
+                    continue
+                problem(summary.coerced, "age", line_no, message + "; using None")
+                age = None
+            try:
+                grade = float(grade_s)
+                if not math.isfinite(grade):
+                    raise ValueError(grade_s)
+            except ValueError:
+                message = f"grade {grade_s!r} is not a finite number"
+                if policy != "coerce":
+                    problem(summary.rejected, "bad grade", line_no, message)
+                    continue
+                problem(summary.coerced, "grade", line_no, message + "; using 0.0")
+                grade = 0.0
+            summary.accepted += 1
+            yield {"name": parts[0].strip(), "age": age, "grade": grade, "subject": parts[3].strip()}
+
+
+def iter_students(file_path=CSV_PATH, chunk_size=1 << 16, policy=None, summary=None):
+    """Yield student dicts one row at a time; reads the file in chunk_size-byte blocks.
+
+    By default rows are parsed leniently and silently (short rows dropped,
+    bad ages -> None, bad grades -> 0.0). Passing a policy ("coerce",
+    "skip" or "fail") or a ValidationSummary switches to the validating
+    parser: quoted fields are handled per RFC 4180, non-finite grades count
+    as bad, and every rejection and coercion is recorded in `summary`.
+    """
+    if policy is None and summary is None:
+        for line in _iter_data_lines(file_path, chunk_size):
+            student = _parse_student_row(line)
+            if student is not None:
+                yield student
+        return
+
+    policy = policy or (summary.policy if summary is not None else "coerce")
+    if policy not in PARSE_POLICIES:
+        raise ValueError(f"[ERROR] Unknown parse policy: {policy}")
+    if summary is None:
+        summary = ValidationSummary(policy)
+    summary.policy = policy
+    yield from _iter_validated(file_path, chunk_size, policy, summary)
+
+
+@stage("load_students")
+def load_students(file_path=CSV_PATH, policy=None, summary=None):
+    """Return the full list of student dicts; see iter_students for a streaming version."""
+    return list(iter_students(file_path, policy=policy, summary=summary))
+
+
+def data_start(f):
+    """Byte offset just past the header of a binary CSV file object, or None.
+
+    None means the file uses bare '\r' line endings, which newline-aligned
+    byte offsets cannot split; such files must be read with iter_students.
+    """
+    while True:
+        raw = f.readline()
+        if not raw:
+            return f.tell()
+        line = raw.decode("utf-8")
+        if not line.strip():
             continue
-        name, age_s, grade_s, subject = parts[:4]
+        if "\r" in line.rstrip("\r\n"):
+            return None
+        return f.tell()
 
+
+def iter_students_range(file_path, start, end, chunk_size=1 << 16):
+    """Yield the student dicts of the data rows in bytes [start, end) of a CSV.
+
+    Rows are read one line at a time, so memory does not grow with the
+    range. `start` should be a line start (see data_start); a line running
+    past `end` is cut off there, as if the file ended at `end`.
+    """
+    with open(file_path, "rb", buffering=chunk_size) as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            if pos >= end:
+                break
+            if pos + len(raw) > end:
+                raw = raw[:end - pos]
+            pos += len(raw)
+            text = raw.decode("utf-8")
+            # Split a stray bare '\r' the way open(..., newline="") would
+            for line in text.split("\r") if "\r" in text.rstrip("\r\n") else (text,):
+                line = line.strip()
+                if not line:
+                    continue
+                student = _parse_student_row(line)
+                if student is not None:
+                    yield student
+
+
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class StudentTable:
+    """Columnar roster: one typed array per field instead of one dict per student.
+
+    Ages and grades live in array('q') / array('d') with a parallel 0/1
+    mask marking which values were actually present, so a bad grade is
+    "missing" rather than 0.0 (as is an age outside the int64 range of
+    array('q')). Subjects are stored as small integer codes
+    into `subjects`. Iterating a table yields the usual student dicts
+    (missing values come back as None), so every function that takes a
+    list of students also takes a StudentTable.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ages = array("q")
+        self.age_mask = array("B")
+        self.grades = array("d")
+        self.grade_mask = array("B")
+        self.subject_codes = array("I")
+        self.subjects = []
+        self._subject_index = {}
+        self._grade_indexes = {}
+
+    @classmethod
+    def from_csv(cls, file_path=CSV_PATH, chunk_size=1 << 16):
+        """Parse a CSV straight into columns, with the same row rules as load_students."""
+        table = cls()
+        for line in _iter_data_lines(file_path, chunk_size):
+            fields = _split_student_row(line)
+            if fields is not None:
+                table.append_fields(*fields)
+        return table
+
+    @classmethod
+    def from_students(cls, students):
+        table = cls()
+        for s in students:
+            table.append(s)
+        return table
+
+    def _subject_code(self, subject):
+        code = self._subject_index.get(subject)
+        if code is None:
+            code = self._subject_index[subject] = len(self.subjects)
+            self.subjects.append(subject)
+        return code
+
+    def _push(self, name, age, grade, subject):
+        if age is not None and not _INT64_MIN <= age <= _INT64_MAX:
+            age = None
+        self._grade_indexes.clear()
+        self.names.append(name)
+        self.ages.append(age if age is not None else 0)
+        self.age_mask.append(age is not None)
+        self.grades.append(grade if grade is not None else 0.0)
+        self.grade_mask.append(grade is not None)
+        self.subject_codes.append(self._subject_code(subject))
+
+    def append_fields(self, name, age_s, grade_s, subject):
+        """Append one row from its raw string fields."""
         try:
             age = int(age_s)
         except ValueError:
@@ -40,150 +406,1041 @@ def load_students(file_path=CSV_PATH):
         try:
             grade = float(grade_s)
         except ValueError:
-            grade = 0.0
-        students.append({"name": name, "age": age, "grade": grade, "subject": subject})
-    return students
+            grade = None
+        if grade is not None and grade != grade:  # NaN
+            grade = None
+        self._push(name, age, grade, subject)
 
+    def append(self, s):
+        """Append one student dict; non-numeric age/grade values are masked."""
+        age = s.get("age")
+        grade = s.get("grade")
+        if isinstance(age, float):
+            age = int(age) if math.isfinite(age) else None
+        grade = float(grade) if isinstance(grade, (int, float)) else None
+        if grade is not None and grade != grade:  # NaN, masked as in append_fields
+            grade = None
+        self._push(s.get("name"), age if isinstance(age, int) else None, grade, s.get("subject"))
 
-def calculate_average_grade(students):
-    grades = [s.get("grade") for s in students if isinstance(s.get("grade"), (int, float))]
-    if not grades:
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, i):
+        """Return row i as a student dict."""
+        return {
+            "name": self.names[i],
+            "age": self.ages[i] if self.age_mask[i] else None,
+            "grade": self.grades[i] if self.grade_mask[i] else None,
+            "subject": self.subjects[self.subject_codes[i]],
+        }
+
+    def __iter__(self):
+        for i in range(len(self.names)):
+            yield self.row(i)
+
+    def column(self, field):
+        """Return the 'age' or 'grade' column as a NumPy view if available, else the array.
+
+        While a NumPy view is alive the table cannot grow (array.array refuses
+        to resize a buffer that is exported).
+        """
+        values = self.ages if field == "age" else self.grades
+        if _load_numpy() is not None:
+            return _np_view(values)
+        return values
+
+    def mask(self, field):
+        """Return the presence mask of the 'age' or 'grade' column."""
+        return self.age_mask if field == "age" else self.grade_mask
+
+    def present(self, field):
+        """Yield only the non-missing values of the 'age' or 'grade' column."""
+        values = self.ages if field == "age" else self.grades
+        return (v for v, ok in zip(values, self.mask(field)) if ok)
+
+    def grade_index(self, by_subject=False):
+        """GradeIndex over this table's grades, built on first use and then reused."""
+        index = self._grade_indexes.get(by_subject)
+        if index is None:
+            index = self._grade_indexes[by_subject] = GradeIndex.from_students(self, by_subject)
+        return index
+
+    def subject_counts(self):
+        """Return {subject: row count} using the interned subject codes."""
+        if _numpy_enabled():
+            counts = np.bincount(_np_view(self.subject_codes), minlength=len(self.subjects))
+            return {self.subjects[code]: int(n) for code, n in enumerate(counts)}
+        counts = [0] * len(self.subjects)
+        for code in self.subject_codes:
+            counts[code] += 1
+        return {self.subjects[code]: n for code, n in enumerate(counts)}
+
+
+# --- Optional NumPy statistics backend ---
+#
+# With NumPy installed, StudentTable columns and grade lists are reduced
+# with vectorized operations; otherwise (or after set_stats_backend("python"))
+# the plain loops below are used. Both produce the same reports.
+
+# "auto" means NumPy when it is installed, else the pure-Python loops
+STATS_BACKEND = "auto"
+
+
+def _load_numpy():
+    """Import NumPy on first call; return the module, or None if it is not installed."""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+def set_stats_backend(name):
+    """Select the 'auto', 'numpy' or 'python' statistics backend; returns the previous one."""
+    global STATS_BACKEND
+    if name not in ("auto", "numpy", "python"):
+        raise ValueError(f"[ERROR] Unknown stats backend: {name}")
+    if name == "numpy" and _load_numpy() is None:
+        raise ValueError("[ERROR] NumPy backend requested but NumPy is not installed")
+    previous, STATS_BACKEND = STATS_BACKEND, name
+    return previous
+
+
+def _numpy_enabled():
+    return STATS_BACKEND != "python" and _load_numpy() is not None
+
+
+def active_stats_backend():
+    """Name of the backend actually in use: 'numpy' or 'python'."""
+    return "numpy" if _numpy_enabled() else "python"
+
+
+def _np_view(values):
+    """Zero-copy NumPy view of an array.array."""
+    if not len(values):
+        return np.empty(0, dtype=values.typecode)
+    return np.frombuffer(values, dtype=values.typecode)
+
+
+def _np_mask(table, field):
+    return _np_view(table.mask(field)).astype(bool)
+
+
+def _np_present(table, field):
+    """NumPy array of the non-missing values of a table column."""
+    return _np_view(table.ages if field == "age" else table.grades)[_np_mask(table, field)]
+
+
+def _np_grade_distribution(grades, buckets=None):
+    """Bucket counts via searchsorted + bincount; same labels/order as `buckets`."""
+    buckets = buckets or GRADE_BUCKETS
+    grades = np.asarray(grades, dtype=float)
+    bounded = sorted((lower, label) for label, lower in buckets if lower is not None)
+    edges = [lower for lower, _ in bounded]
+    # bins[0] catches everything below the lowest edge (and NaN, which fails every >= test)
+    bins = [next((label for label, lower in buckets if lower is None), None)]
+    bins += [label for _, label in bounded]
+    idx = np.searchsorted(edges, grades, side="right")
+    idx[np.isnan(grades)] = 0
+    counts = np.bincount(idx, minlength=len(bins))
+    distribution = {label: 0 for label, _ in buckets}
+    for label, n in zip(bins, counts.tolist()):
+        if label is not None:
+            distribution[label] += n
+    return distribution
+
+
+def _np_moments(values):
+    """RunningMoments for a NumPy array (NaN excluded), computed with array reductions."""
+    values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+    moments = RunningMoments()
+    if len(values):
+        moments.count = int(len(values))
+        moments.mean = float(values.mean())
+        moments.m2 = float(((values - moments.mean) ** 2).sum())
+        moments.min = values.min().item()
+        moments.max = values.max().item()
+    return moments
+
+
+def _np_table_stats(table):
+    """Build a StudentStats for a whole table with column-wise NumPy reductions."""
+    stats = StudentStats()
+    stats.count = len(table)
+
+    grades = _np_present(table, "grade")
+    stats.grade_count = len(grades)
+    if len(grades):
+        stats.grade_sum = float(grades.sum())
+        stats.grade_min = float(grades.min())
+        stats.grade_max = float(grades.max())
+        top = np.flatnonzero(_np_mask(table, "grade") & (table.column("grade") == stats.grade_max))
+        stats.top_names = [table.names[i] for i in top.tolist()]
+        stats.distribution = _np_grade_distribution(grades)
+        stats.grade_moments = _np_moments(grades)
+
+    ages = _np_present(table, "age")
+    stats.age_count = len(ages)
+    stats.age_sum = int(ages.sum()) if len(ages) else 0
+    stats.age_moments = _np_moments(ages)
+
+    for subj, n in table.subject_counts().items():
+        key = (subj or "Unknown").strip() or "Unknown"
+        stats.by_subject[key] = stats.by_subject.get(key, 0) + n
+    return stats
+
+
+def _mean_of(students, key):
+    """Running mean of the numeric `key` field over any iterable of student dicts."""
+    total = 0
+    count = 0
+    if isinstance(students, StudentTable):
+        if _numpy_enabled():
+            values = _np_present(students, key)
+            return float(values.mean()) if len(values) else 0.0
+        for value in students.present(key):
+            total += value
+            count += 1
+    else:
+        for s in students:
+            value = s.get(key)
+            if isinstance(value, (int, float)):
+                total += value
+                count += 1
+    if not count:
         return 0.0
-    return sum(grades) / len(grades)
+    return total / count
+
+
+@stage("calculate_average_grade")
+def calculate_average_grade(students):
+    """Return average grade as a float; uses only numeric grades. Accepts any iterable."""
+    return _mean_of(students, "grade")
 
 
+@stage("calculate_average_age")
 def calculate_average_age(students):
-    ages = [s.get("age") for s in students if isinstance(s.get("age"), (int, float))]
-    if not ages:
-        return 0.0
-    return sum(ages) / len(ages)
+    """Return average age as a float; uses only numeric ages. Accepts any iterable."""
+    return _mean_of(students, "age")
 
 
+@stage("count_math_students")
 def count_math_students(students):
+    """Count students whose subject is Math (case-insensitive)."""
+    if isinstance(students, StudentTable):
+        return sum(n for subj, n in students.subject_counts().items()
+                   if str(subj or "").strip().lower() == "math")
     return sum(1 for s in students if str(s.get("subject", "")).strip().lower() == "math")
 
 
+@stage("find_highest_grade")
 def find_highest_grade(students):
-    grades = [s.get("grade") for s in students if isinstance(s.get("grade"), (int, float))]
-    if not grades:
+    """Return the highest numeric grade, or 0.0 if there are none. Accepts any iterable."""
+    highest = None
+    if isinstance(students, StudentTable):
+        if _numpy_enabled():
+            values = _np_present(students, "grade")
+            return float(values.max()) if len(values) else 0.0
+        grades = students.present("grade")
+    else:
+        grades = (s.get("grade") for s in students)
+    for grade in grades:
+        if isinstance(grade, (int, float)) and (highest is None or grade > highest):
+            highest = grade
+    if highest is None:
         return 0.0
-    return max(grades)
+    return highest
 
 
-def generate_report():
-    """Create the formatted report string using current CSV data."""
-    students = load_students(CSV_PATH)
-    total_students = len(students)
-    average = calculate_average_grade(students)
-    age_average = calculate_average_age(students)
-    math_count = count_math_students(students)
-    highest_grade = find_highest_grade(students)
+# Grade buckets in report order: (label, inclusive lower bound)
+GRADE_BUCKETS = [
+    ('A (90-100)', 90),
+    ('B (80-89)', 80),
+    ('C (70-79)', 70),
+    ('D (60-69)', 60),
+    ('F (0-59)', None),
+]
 
-    top_students = [
-        s["name"]
-        for s in students
-        if isinstance(s.get("grade"), (int, float)) and s["grade"] == highest_grade
-    ]
 
-    by_subject = {}
-    for s in students:
-        subj = (s.get("subject") or "Unknown").strip() or "Unknown"
-        by_subject[subj] = by_subject.get(subj, 0) + 1
+def _check_buckets(buckets):
+    """Require highest-first lower bounds with at most one trailing None bucket.
+
+    Every backend (loop, GradeIndex, NumPy) relies on this order, so other
+    layouts are rejected instead of being counted differently per backend.
+    """
+    bounds = [lower for _, lower in buckets]
+    if None in bounds[:-1]:
+        raise ValueError("[ERROR] Only the last grade bucket may have a lower bound of None")
+    bounded = [b for b in bounds if b is not None]
+    if any(a <= b for a, b in zip(bounded, bounded[1:])):
+        raise ValueError("[ERROR] Grade buckets must be ordered highest lower bound first")
+    return buckets
+
+
+def _grade_bucket(grade, buckets=GRADE_BUCKETS):
+    """Return the label of the first bucket a grade falls into (None if it fits none)."""
+    for label, lower in buckets:
+        if lower is None or grade >= lower:
+            return label
+    return None
+
+
+class GradeIndex:
+    """Sorted grades for O(log n) range counts, bucket counts and percentiles.
+
+    Build it once with GradeIndex.from_students() (or StudentTable.grade_index())
+    and query it as often as needed; by_subject=True also keeps one index per
+    subject, reachable through for_subject().
+    """
+
+    def __init__(self, grades):
+        grades = list(grades)
+        # NaN would break the sort order; keep a count so buckets still see it
+        self.grades = sorted(g for g in grades if g == g)
+        self.nan_count = len(grades) - len(self.grades)
+        self.subjects = {}
+
+    @classmethod
+    def from_students(cls, students, by_subject=False):
+        grades = []
+        per_subject = {}
+        for s in students:
+            grade = s.get("grade")
+            if not isinstance(grade, (int, float)):
+                continue
+            grades.append(grade)
+            if by_subject:
+                subj = (s.get("subject") or "Unknown").strip() or "Unknown"
+                per_subject.setdefault(subj, []).append(grade)
+        index = cls(grades)
+        index.subjects = {subj: cls(values) for subj, values in per_subject.items()}
+        return index
+
+    def __len__(self):
+        return len(self.grades) + self.nan_count
+
+    def for_subject(self, subject):
+        """Index of one subject's grades (empty if the subject is unknown)."""
+        return self.subjects.get(subject) or GradeIndex([])
+
+    def count_range(self, low=None, high=None):
+        """Count grades with low <= grade <= high; either bound may be None (open)."""
+        lo = 0 if low is None else bisect.bisect_left(self.grades, low)
+        hi = len(self.grades) if high is None else bisect.bisect_right(self.grades, high)
+        return max(0, hi - lo)
+
+    def count_below(self, bound):
+        """Count grades strictly below `bound`."""
+        return bisect.bisect_left(self.grades, bound)
+
+    def percentile(self, p):
+        """Return the p-th percentile (0-100), linearly interpolated; 0.0 if empty."""
+        if not self.grades:
+            return 0.0
+        if not 0 <= p <= 100:
+            raise ValueError(f"[ERROR] Percentile must be between 0 and 100, got {p}")
+        pos = (len(self.grades) - 1) * p / 100
+        i = int(pos)
+        if i + 1 >= len(self.grades):
+            return float(self.grades[-1])
+        frac = pos - i
+        return float(self.grades[i] + (self.grades[i + 1] - self.grades[i]) * frac)
+
+    def median(self):
+        return self.percentile(50)
+
+    def bucket_counts(self, buckets=GRADE_BUCKETS):
+        """Counts per bucket; buckets are (label, lower bound) pairs, highest first."""
+        _check_buckets(buckets)
+        distribution = {label: 0 for label, _ in buckets}
+        upper = None
+        for label, lower in buckets:
+            upper_idx = len(self.grades) if upper is None else self.count_below(upper)
+            if lower is None:
+                distribution[label] += upper_idx + self.nan_count
+                break
+            distribution[label] += max(0, upper_idx - self.count_below(lower))
+            upper = lower if upper is None else min(upper, lower)
+        return distribution
+
+
+class RunningMoments:
+    """Mergeable count/mean/M2 (Welford, combined with Chan et al.) plus min and max.
+
+    O(1) memory and numerically stable; variance/stddev are population
+    values (divide by n). NaN inputs are ignored.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        self.update((x,))
+
+    def update(self, values):
+        """Fold in every value; the loop keeps its state in locals."""
+        count, mean, m2, lo, hi = self.count, self.mean, self.m2, self.min, self.max
+        for x in values:
+            if x != x:
+                continue
+            count += 1
+            delta = x - mean
+            mean += delta / count
+            m2 += delta * (x - mean)
+            if lo is None or x < lo:
+                lo = x
+            if hi is None or x > hi:
+                hi = x
+        self.count, self.mean, self.m2, self.min, self.max = count, mean, m2, lo, hi
+        return self
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
 
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, state):
+        moments = cls()
+        for name in cls.__slots__:
+            setattr(moments, name, state[name])
+        return moments
+
+
+def _subject_key(s):
+    """Normalized subject used for grouping; blank or missing subjects become 'Unknown'."""
+    return (s.get("subject") or "Unknown").strip() or "Unknown"
+
+
+# Rows folded per batch by GroupStats.update / StudentStats.update
+_FOLD_CHUNK = 256
+
+
+class GroupStats:
+    """Per-group accumulator: row count plus grade count/mean/min/max/buckets and mean age.
+
+    Rows are folded a batch at a time: update() pulls the numeric grades
+    and ages out of up to _FOLD_CHUNK rows and hands them to add_grades()
+    and add_ages(), the one place grades and ages are accumulated
+    (StudentStats and the mmap scanner feed them too).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.grade_count = 0
+        self.grade_sum = 0
+        self.grade_min = None
+        self.grade_max = None
+        self.age_count = 0
+        self.age_sum = 0
+        self.distribution = {label: 0 for label, _ in GRADE_BUCKETS}
+
+    def add(self, s):
+        self._fold((s,))
+
+    def update(self, students):
+        rows = iter(students)
+        while True:
+            chunk = list(itertools.islice(rows, _FOLD_CHUNK))
+            if not chunk:
+                return self
+            self._fold(chunk)
+
+    def _fold(self, chunk):
+        self.count += len(chunk)
+        self.add_grades([g for g in [s.get("grade") for s in chunk] if isinstance(g, (int, float))])
+        self.add_ages([a for a in [s.get("age") for s in chunk] if isinstance(a, (int, float))])
+
+    def add_grades(self, grades):
+        """Fold a sequence of numeric grades into count/sum/min/max and the buckets."""
+        total, lo, hi = self.grade_sum, self.grade_min, self.grade_max
+        distribution = self.distribution
+        for g in grades:
+            total += g
+            if lo is None or g < lo:
+                lo = g
+            if hi is None or g > hi:
+                hi = g
+            distribution[_grade_bucket(g)] += 1
+        self.grade_count += len(grades)
+        self.grade_sum, self.grade_min, self.grade_max = total, lo, hi
+
+    def add_ages(self, ages):
+        """Fold a sequence of numeric ages into count/sum."""
+        total = self.age_sum
+        for a in ages:
+            total += a
+        self.age_count += len(ages)
+        self.age_sum = total
+
+    def merge(self, other):
+        self.count += other.count
+        self.grade_count += other.grade_count
+        self.grade_sum += other.grade_sum
+        if other.grade_min is not None and (self.grade_min is None or other.grade_min < self.grade_min):
+            self.grade_min = other.grade_min
+        if other.grade_max is not None and (self.grade_max is None or other.grade_max > self.grade_max):
+            self.grade_max = other.grade_max
+        self.age_count += other.age_count
+        self.age_sum += other.age_sum
+        for label, n in other.distribution.items():
+            self.distribution[label] += n
+        return self
+
+    @property
+    def average_grade(self):
+        return self.grade_sum / self.grade_count if self.grade_count else 0.0
+
+    @property
+    def average_age(self):
+        return self.age_sum / self.age_count if self.age_count else 0.0
+
+
+class StudentStats(GroupStats):
+    """Fused single-pass accumulator for every statistic the reports print.
+
+    Feed it student dicts with add()/update() (any iterable works, including
+    iter_students) and read the results off the attributes and properties.
+    The grade and age aggregates are those of a GroupStats over all rows;
+    on top of them it keeps the names tied at the highest grade, the
+    per-subject row counts and, unless built with moments=False, the
+    Welford moments behind the variance and std dev figures (the summary
+    report does not print those, so its paths skip them).
+    """
+
+    def __init__(self, moments=True):
+        super().__init__()
+        self.top_names = []
+        self.grade_moments = RunningMoments() if moments else None
+        self.age_moments = RunningMoments() if moments else None
+        self.by_subject = {}
+
+    @classmethod
+    def from_students(cls, students, moments=True):
+        return cls(moments).update(students)
+
+    def update(self, students):
+        if isinstance(students, StudentTable) and _numpy_enabled():
+            return self.merge(_np_table_stats(students))
+        return super().update(students)
+
+    def to_dict(self):
+        """JSON-friendly copy of the accumulator state."""
+        state = dict(vars(self))
+        state["top_names"] = list(self.top_names)
+        state["by_subject"] = dict(self.by_subject)
+        state["distribution"] = dict(self.distribution)
+        for name in ("grade_moments", "age_moments"):
+            if state[name] is not None:
+                state[name] = state[name].to_dict()
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild an accumulator saved with to_dict()."""
+        stats = cls()
+        for key, value in state.items():
+            if key in vars(stats):
+                setattr(stats, key, value)
+        stats.top_names = list(stats.top_names)
+        stats.by_subject = dict(stats.by_subject)
+        stats.distribution = dict(stats.distribution)
+        for name in ("grade_moments", "age_moments"):
+            if isinstance(getattr(stats, name), dict):
+                setattr(stats, name, RunningMoments.from_dict(getattr(stats, name)))
+        return stats
+
+    def merge(self, other):
+        """Fold another StudentStats (e.g. from a different chunk) into this one."""
+        if other.grade_max is not None:
+            if self.grade_max is None or other.grade_max > self.grade_max:
+                self.top_names = list(other.top_names)
+            elif other.grade_max == self.grade_max:
+                self.top_names.extend(other.top_names)
+        super().merge(other)
+        for name in ("grade_moments", "age_moments"):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if mine is not None:
+                if theirs is None:
+                    raise ValueError("[ERROR] Cannot merge StudentStats built with moments=False into one with moments")
+                mine.merge(theirs)
+        by_subject = self.by_subject
+        for subj, n in other.by_subject.items():
+            by_subject[subj] = by_subject.get(subj, 0) + n
+        return self
+
+    def _fold(self, chunk):
+        self.count += len(chunk)
+        graded = [s for s in chunk if isinstance(s.get("grade"), (int, float))]
+        self.add_grades([s["grade"] for s in graded], [s["name"] for s in graded])
+        self.add_ages([a for a in [s.get("age") for s in chunk] if isinstance(a, (int, float))])
+        # The report's subject counts (and math_count) are these plain tallies, keyed
+        # like GroupedStats("subject").counts(); a full GroupStats per subject would
+        # cost the summary report per-group grade/age folds it never prints
+        by_subject = self.by_subject
+        for s in chunk:
+            subj = _subject_key(s)
+            by_subject[subj] = by_subject.get(subj, 0) + 1
+
+    def add_grades(self, grades, names=()):
+        """Fold grades (see GroupStats.add_grades) and track the names tied at the top.
+
+        `names` runs parallel to `grades`; its items may be anything (the
+        mmap scanner passes byte spans and decodes the winners at the end).
+        """
+        previous = self.grade_max
+        super().add_grades(grades)
+        if self.grade_moments is not None:
+            self.grade_moments.update(grades)
+        if not names:
+            return
+        # Any grade equal to the final maximum came at or after the row that raised it,
+        # and NaN never equals itself, so it never names a top student
+        high = self.grade_max
+        if previous is None or high > previous:
+            self.top_names = [names[i] for i, g in enumerate(grades) if g == high]
+        elif high == previous:
+            self.top_names.extend(names[i] for i, g in enumerate(grades) if g == high)
+
+    def add_ages(self, ages):
+        super().add_ages(ages)
+        if self.age_moments is not None:
+            self.age_moments.update(ages)
+
+    @property
+    def math_count(self):
+        return self.subject_count("math")
+
+    def subject_count(self, subject):
+        """Rows whose subject matches `subject` case-insensitively."""
+        subject = subject.strip().lower()
+        return sum(n for subj, n in self.by_subject.items() if subj.lower() == subject)
+
+    @property
+    def highest_grade(self):
+        return self.grade_max if self.grade_max is not None else 0.0
+
+    @property
+    def lowest_grade(self):
+        return self.grade_min if self.grade_min is not None else 0.0
+
+    def grade_distribution(self):
+        """Bucket counts in the same shape as analyze_grade_distribution()."""
+        if not self.grade_count:
+            return {}
+        return dict(self.distribution)
+
+
+def format_report(stats):
+    """Render a StudentStats into the plain-text analysis report."""
+    top_students = stats.top_names
     lines = []
     lines.append("Student Analysis Report")
     lines.append("=" * 30)
-    lines.append(f"Total students: {total_students}")
-    lines.append(f"Average grade: {average:.1f}")
-    lines.append(f"Average age: {age_average:.1f}")
-    lines.append(f"Highest grade: {highest_grade:.1f} (by: {', '.join(top_students) if top_students else 'N/A'})")
-    lines.append(f"Math students: {math_count}")
+    lines.append(f"Total students: {stats.count}")
+    lines.append(f"Average grade: {stats.average_grade:.1f}")
+    lines.append(f"Average age: {stats.average_age:.1f}")
+    lines.append(f"Highest grade: {stats.highest_grade:.1f} (by: {', '.join(top_students) if top_students else 'N/A'})")
+    lines.append(f"Math students: {stats.math_count}")
     lines.append("")
     lines.append("Counts by subject:")
-    for subj in sorted(by_subject.keys()):
-        lines.append(f"  {subj}: {by_subject[subj]}")
+    for subj in sorted(stats.by_subject.keys()):
+        lines.append(f"  {subj}: {stats.by_subject[subj]}")
+    return "\n".join(lines)
+
+
+# Named group-by columns; anything else is read from the row dict as-is
+_GROUP_FIELDS = {
+    "subject": _subject_key,
+    "age": lambda s: s.get("age"),
+    "name": lambda s: s.get("name"),
+}
+
+
+def _group_key_fn(key):
+    if callable(key):
+        return key
+    fields = (key,) if isinstance(key, str) else tuple(key)
+    getters = [_GROUP_FIELDS.get(f) or (lambda s, f=f: s.get(f)) for f in fields]
+    if len(getters) == 1:
+        return getters[0]
+    return lambda s: tuple(get(s) for get in getters)
+
+
+def _sortable(key):
+    """Sort key that orders None first and never compares None with values."""
+    if isinstance(key, tuple):
+        return tuple(_sortable(k) for k in key)
+    return (key is not None, key)
+
+
+class GroupedStats:
+    """Hash-based group-by engine: one GroupStats per key, built in a single pass.
+
+    `key` is a column name ("subject", "age", ...), a tuple of column names
+    for a composite key, or a function of the student dict. Partial results
+    from different chunks or workers combine with merge(). Subject keys use
+    the same normalization as the report's "Counts by subject".
+    """
+
+    def __init__(self, key="subject"):
+        self.key = key
+        self.groups = {}
+        self._key_fn = _group_key_fn(key)
+
+    def __getstate__(self):
+        state = dict(vars(self))
+        del state["_key_fn"]  # may be a lambda; rebuilt from self.key
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._key_fn = _group_key_fn(self.key)
+
+    @classmethod
+    def from_students(cls, students, key="subject"):
+        return cls(key).update(students)
+
+    def update(self, students):
+        key_fn = self._key_fn
+        groups = self.groups
+        for s in students:
+            k = key_fn(s)
+            group = groups.get(k)
+            if group is None:
+                group = groups[k] = GroupStats()
+            group.add(s)
+        return self
+
+    def merge(self, other):
+        for k, group in other.groups.items():
+            if k in self.groups:
+                self.groups[k].merge(group)
+            else:
+                self.groups[k] = GroupStats().merge(group)
+        return self
+
+    def counts(self):
+        """{key: row count}; for key="subject" these equal StudentStats.by_subject."""
+        return {k: g.count for k, g in self.groups.items()}
+
+    def rows(self):
+        """Stable output: one dict per group, sorted by key (None first)."""
+        return [
+            {
+                "key": k,
+                "count": g.count,
+                "average_grade": g.average_grade,
+                "lowest_grade": g.grade_min if g.grade_min is not None else 0.0,
+                "highest_grade": g.grade_max if g.grade_max is not None else 0.0,
+                "average_age": g.average_age,
+                "grade_distribution": dict(g.distribution) if g.grade_count else {},
+            }
+            for k, g in sorted(self.groups.items(), key=lambda item: _sortable(item[0]))
+        ]
+
+
+def format_group_report(grouped):
+    """Render GroupedStats.rows() as a plain-text table in the report style."""
+    key_name = grouped.key if not callable(grouped.key) else "group"
+    if isinstance(key_name, (tuple, list)):
+        key_name = ", ".join(key_name)
+    lines = []
+    lines.append(f"Grades by {key_name}")
+    lines.append("=" * 30)
+    for row in grouped.rows():
+        key = row["key"]
+        label = ", ".join(str(k) for k in key) if isinstance(key, tuple) else str(key)
+        lines.append(f"  {label}: {row['count']} students, average {row['average_grade']:.1f}, "
+                     f"min {row['lowest_grade']:.1f}, max {row['highest_grade']:.1f}")
     return "\n".join(lines)
 
+
+@stage("generate_report")
+def generate_report(students=None, incremental=False):
+    """Create the formatted report string using current CSV data (one streaming pass).
+
+    Pass already-loaded `students` to reuse them instead of re-reading CSV_PATH,
+    or incremental=True to fold in only rows appended since the last run.
+    """
+    if incremental:
+        from incremental import update_stats
+        return format_report(update_stats(CSV_PATH))
+    if students is None:
+        students = iter_students(CSV_PATH)
+    return format_report(StudentStats(moments=False).update(students))
+
 # --- Advanced modular implementation (previously in data_analysis_function) ---
 
-def analyze_grade_distribution(grades):
-    if not grades:
-        return {}
+@stage("analyze_grade_distribution")
+def analyze_grade_distribution(grades, buckets=None, approximate=False):
+    """Count grades per bucket.
 
-    distribution = {
-        'A (90-100)': 0,
-        'B (80-89)': 0,
-        'C (70-79)': 0,
-        'D (60-69)': 0,
-        'F (0-59)': 0
-    }
+    `grades` may be a list/array of grades or a GradeIndex (answered with
+    bisect instead of a scan). `buckets` defaults to GRADE_BUCKETS and takes
+    the same (label, inclusive lower bound) pairs, highest bucket first;
+    a lower bound of None catches everything below the other buckets.
 
+    With approximate=True (or when `grades` is a KLLSketch/ApproxStats) the
+    counts come from a constant-memory quantile sketch and each bucket maps
+    to an (estimate, +/- error) pair instead of an exact count.
+    """
+    buckets = _check_buckets(buckets or GRADE_BUCKETS)
+    # Sketch types are matched by name so sketches.py is only imported when used
+    if approximate or type(grades).__name__ in ("KLLSketch", "ApproxStats"):
+        from sketches import ApproxStats, KLLSketch
+        approx = grades if isinstance(grades, ApproxStats) else ApproxStats()
+        if isinstance(grades, KLLSketch):
+            approx.grades = grades
+        elif approx is not grades:
+            approx.grades.extend(grades)
+        return approx.grade_distribution(buckets) if approx.grades.n else {}
+    if not hasattr(grades, "__len__") and _numpy_enabled():
+        grades = list(grades)  # the NumPy path needs a sequence; the loop below streams
+    if hasattr(grades, "__len__") and len(grades) == 0:
+        return {}
+    if isinstance(grades, GradeIndex):
+        return grades.bucket_counts(buckets)
+    if _numpy_enabled():
+        return _np_grade_distribution(grades, buckets)
+
+    distribution = {label: 0 for label, _ in buckets}
+    seen = False
     for g in grades:
-        if g >= 90:
-            distribution['A (90-100)'] += 1
-        elif g >= 80:
-            distribution['B (80-89)'] += 1
-        elif g >= 70:
-            distribution['C (70-79)'] += 1
-        elif g >= 60:
-            distribution['D (60-69)'] += 1
-        else:
-            distribution['F (0-59)'] += 1
+        seen = True
+        label = _grade_bucket(g, buckets)
+        if label is not None:
+            distribution[label] += 1
+    return distribution if seen else {}
 
-    return distribution
+
+def top_performers(students, threshold=90):
+    """Yield students with a numeric grade >= threshold, in input order, without buffering."""
+    if isinstance(students, StudentTable):
+        if _numpy_enabled():
+            mask = _np_mask(students, "grade") & (students.column("grade") >= threshold)
+            hits = np.flatnonzero(mask).tolist()
+        else:
+            hits = (i for i, (g, ok) in enumerate(zip(students.grades, students.grade_mask))
+                    if ok and g >= threshold)
+        for i in hits:
+            yield students.row(i)
+        return
+    for s in students:
+        if isinstance(s.get('grade'), (int, float)) and s['grade'] >= threshold:
+            yield s
 
 
 def find_top_performers(students, threshold=90):
-    return [s for s in students if s.get('grade', 0) >= threshold]
+    return list(top_performers(students, threshold))
+
+
+def _grade_key(s):
+    grade = s.get("grade")
+    # NaN compares false against everything, so it must never reach the heap
+    return grade if isinstance(grade, (int, float)) and grade == grade else None
+
+
+def top_k(students, k, key=None, ties=False):
+    """Return the k highest-ranked students (by grade unless `key` is given) in O(k) memory.
+
+    Results are ordered best first; equal keys keep their input order. With
+    ties=True, everyone tied with the k-th place is included too, so
+    top_k(students, 1, ties=True) names the same students as the report's
+    "Highest grade ... (by: ...)" line. Rows whose key is None are skipped.
+    Works on any iterable, including iter_students and StudentTable.
+    """
+    if k <= 0:
+        return []
+    rows = students
+    by_index = isinstance(students, StudentTable) and key is None
+    if by_index:
+        # Rank row indices straight off the grade column; build dicts only for winners
+        grades, mask = students.grades, students.grade_mask
+        rows = range(len(students))
+        key = lambda i: grades[i] if mask[i] else None  # noqa: E731
+    elif key is None:
+        key = _grade_key
+
+    heap = []    # (value, -position, row); heap[0] is the current k-th place
+    extra = []   # rows tied with heap[0] that did not fit in k (ties=True only)
+    for pos, row in enumerate(rows):
+        value = key(row)
+        if value is None:
+            continue
+        entry = (value, -pos, row)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif value > heap[0][0]:
+            dropped = heapq.heapreplace(heap, entry)
+            if ties:
+                if dropped[0] == heap[0][0]:
+                    extra.append(dropped)
+                else:
+                    extra = []
+        elif ties and value == heap[0][0]:
+            extra.append(entry)
+
+    ranked = sorted(heap + extra, key=lambda e: (-e[0], -e[1]))
+    if by_index:
+        return [students.row(e[2]) for e in ranked]
+    return [e[2] for e in ranked]
+
+
+REPORT_BUFFER_SIZE = 1 << 20
+
 
+def write_report_lines(lines, filename, buffer_size=REPORT_BUFFER_SIZE, atomic=True):
+    """Write an iterable of text chunks to filename in large batched writes.
 
-def generate_detailed_report(students, filename):
+    Chunks are joined into ~buffer_size strings before each write, so the
+    number of write calls does not grow with the number of lines. With
+    atomic=True the text goes to a temp file in the same directory that is
+    renamed over filename at the end, so a partial report is never visible.
+    """
+    path = os.fspath(filename)
+    out_dir = os.path.dirname(path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    if atomic:
+        # A plain exclusive open (not mkstemp, which forces 0600) gives the temp
+        # file the umask-derived mode open() would give the report itself
+        while True:
+            tmp = os.path.join(out_dir, f".{os.path.basename(path)}.{os.urandom(6).hex()}.tmp")
+            try:
+                f = open(tmp, 'x', encoding='utf-8', buffering=buffer_size)
+                break
+            except FileExistsError:
+                continue
+    else:
+        f = open(path, 'w', encoding='utf-8', buffering=buffer_size)
+
+    try:
+        with f:
+            batch = []
+            size = 0
+            for line in lines:
+                batch.append(line)
+                size += len(line)
+                if size >= buffer_size:
+                    f.write("".join(batch))
+                    batch.clear()
+                    size = 0
+            if batch:
+                f.write("".join(batch))
+        if atomic:
+            if os.path.exists(path):
+                os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))  # keep the report's permissions
+            os.replace(tmp, path)
+    except BaseException:
+        if atomic and os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def detailed_report_lines(students, stats, order=None, memory_budget=None):
+    """Yield the detailed report section by section; one chunk per student record.
+
+    Records are listed in input order, or with order="grade" (highest
+    first), "name" or "subject" through an external merge sort that keeps
+    about memory_budget bytes of records in memory (see external_sort).
+    """
+    import datetime
+
+    average = stats.average_grade
+    highest = stats.highest_grade
+    lowest = stats.lowest_grade
+
+    yield "COMPREHENSIVE STUDENT ANALYSIS REPORT\n"
+    yield "=" * 50 + "\n\n"
+    yield f"Report generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    yield "BASIC STATISTICS\n"
+    yield "-" * 20 + "\n"
+    yield f"Total students: {stats.count}\n"
+    yield f"Average grade: {average:.1f}\n"
+    yield f"Highest grade: {highest:.1f}\n"
+    yield f"Lowest grade: {lowest:.1f}\n"
+    yield f"Grade range: {(highest - lowest):.1f}\n"
+    yield f"Grade std dev: {stats.grade_moments.stddev:.1f} (variance {stats.grade_moments.variance:.1f})\n"
+    yield f"Average age: {stats.average_age:.1f}\n"
+    yield f"Age std dev: {stats.age_moments.stddev:.1f} (variance {stats.age_moments.variance:.1f})\n\n"
+    yield "GRADE DISTRIBUTION\n"
+    yield "-" * 20 + "\n"
+    for bucket, count in stats.grade_distribution().items():
+        pct = (count / stats.count) * 100 if stats.count else 0.0
+        yield f"{bucket}: {count} students ({pct:.1f}%)\n"
+    yield "\n"
+    yield "TOP PERFORMERS (90+)\n"
+    yield "-" * 20 + "\n"
+    any_top = False
+    for s in top_performers(students, 90):
+        any_top = True
+        yield f"{s['name']}: {s['grade']:.1f} ({s['subject']})\n"
+    if not any_top:
+        yield "No students scored 90 or above\n"
+    yield "\n"
+    yield "INDIVIDUAL STUDENT RECORDS\n"
+    yield "-" * 30 + "\n"
+    records = students
+    if order is not None:
+        from external_sort import DEFAULT_MEMORY_BUDGET, sorted_students
+        records = sorted_students(students, order, memory_budget or DEFAULT_MEMORY_BUDGET)
+    for s in records:
+        grade = s['grade']
+        grade_text = f"{float(grade):.1f}" if grade is not None else "None"
+        yield f"Name: {s['name']}\n  Age: {s['age']}\n  Grade: {grade_text}\n  Subject: {s['subject']}\n\n"
+
+
+@stage("generate_detailed_report")
+def generate_detailed_report(students, filename, stats=None, atomic=True, order=None, memory_budget=None):
+    """Write the detailed report for `students` (a list, StudentTable or other re-iterable).
+
+    order/memory_budget sort the individual records; see detailed_report_lines.
+    """
+    if order is not None:
+        from external_sort import SORT_ORDERS
+        if order not in SORT_ORDERS:
+            raise ValueError(f"[ERROR] Unknown sort order: {order} (expected one of {', '.join(SORT_ORDERS)})")
     if not students:
         print("No data to analyze")
         return False
 
-    grades = [float(s['grade']) for s in students]
-    average = calculate_average_grade(students)
-    highest = find_highest_grade(students)
-    lowest = min(grades) if grades else 0.0
-    distribution = analyze_grade_distribution(grades)
-    top_performers = find_top_performers(students, 90)
+    if stats is None:
+        stats = StudentStats.from_students(students)
 
     try:
-        Path(filename).parent.mkdir(parents=True, exist_ok=True)
-        with open(filename, 'w', encoding='utf-8') as file:
-            file.write("COMPREHENSIVE STUDENT ANALYSIS REPORT\n")
-            file.write("=" * 50 + "\n\n")
-            file.write(f"Report generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            file.write("BASIC STATISTICS\n")
-            file.write("-" * 20 + "\n")
-            file.write(f"Total students: {len(students)}\n")
-            file.write(f"Average grade: {average:.1f}\n")
-            file.write(f"Highest grade: {highest:.1f}\n")
-            file.write(f"Lowest grade: {lowest:.1f}\n")
-            file.write(f"Grade range: {(highest - lowest):.1f}\n\n")
-            file.write("GRADE DISTRIBUTION\n")
-            file.write("-" * 20 + "\n")
-            for bucket, count in distribution.items():
-                pct = (count / len(students)) * 100 if students else 0.0
-                file.write(f"{bucket}: {count} students ({pct:.1f}%)\n")
-            file.write("\n")
-            file.write("TOP PERFORMERS (90+)\n")
-            file.write("-" * 20 + "\n")
-            if top_performers:
-                for s in top_performers:
-                    file.write(f"{s['name']}: {s['grade']:.1f} ({s['subject']})\n")
-            else:
-                file.write("No students scored 90 or above\n")
-            file.write("\n")
-            file.write("INDIVIDUAL STUDENT RECORDS\n")
-            file.write("-" * 30 + "\n")
-            for s in students:
-                file.write(f"Name: {s['name']}\n")
-                file.write(f"  Age: {s['age']}\n")
-                file.write(f"  Grade: {float(s['grade']):.1f}\n")
-                file.write(f"  Subject: {s['subject']}\n\n")
-
+        write_report_lines(detailed_report_lines(students, stats, order, memory_budget), filename, atomic=atomic)
         print(f"Detailed report saved to {filename}")
         return True
     except Exception as e:
@@ -192,24 +1449,80 @@ def generate_detailed_report(students, filename):
 
 # --- Compatibility wrapper functions expected by tests ---
 
-def load_data(path='data/students.csv'):
+def load_data(path='data/students.csv', columnar=False):
+    """Load data from CSV and return list of student dicts.
+
+    This is a small compatibility wrapper expected by the tests. Pass
+    columnar=True to get a StudentTable instead. Binary .stcol files
+    (see columnar_format) are detected by extension or magic bytes.
+    """
+    from columnar_format import is_columnar_file, load_columnar
+
+    if is_columnar_file(path):
+        table, _ = load_columnar(path)
+        return table if columnar else list(table)
+    if columnar:
+        return StudentTable.from_csv(path)
     return load_students(path)
 
 
-def analyze_data(students):
-    if not students:
-        return {}
-    grades = [float(s.get('grade', 0)) for s in students]
+@stage("analyze_data")
+def analyze_data(students=None, approximate=False, incremental=False):
+    """Perform a small analysis and return a dictionary of results.
+
+    All values come from a single StudentStats pass over `students` (CSV_PATH
+    when None). With approximate=True the same pass also feeds
+    constant-memory sketches, and results['approximate'] holds grade
+    percentiles, distinct name/subject counts and a sketched grade
+    distribution, each with its error bound. As with generate_report(),
+    incremental=True folds in only the CSV_PATH rows appended since the
+    last run.
+    """
+    if incremental:
+        if approximate:
+            raise ValueError("[ERROR] approximate=True cannot be combined with incremental=True")
+        from incremental import update_stats
+        return analyze_stats(update_stats(CSV_PATH))
+    if students is None:
+        students = iter_students(CSV_PATH)
+    if not approximate:
+        return analyze_stats(StudentStats.from_students(students))
+
+    from sketches import ApproxStats
+    stats = StudentStats()
+    approx = ApproxStats()
+    for s in students:
+        stats.add(s)
+        approx.add(s)
+    results = analyze_stats(stats)
+    results['approximate'] = approx.results()
+    results['approximate']['grade_distribution'] = approx.grade_distribution()
+    return results
+
+
+def analyze_stats(stats):
+    """Build the analyze_data() results dict from an already-filled StudentStats."""
+    if stats.grade_moments is None:
+        raise ValueError("[ERROR] analyze_stats needs a StudentStats built with moments=True")
     return {
-        'average_grade': calculate_average_grade(students),
-        'average_age': calculate_average_age(students),
-        'highest_grade': find_highest_grade(students),
-        'grade_distribution': analyze_grade_distribution(grades),
+        'average_grade': stats.average_grade,
+        'average_age': stats.average_age,
+        'math_count': stats.math_count,
+        'highest_grade': stats.highest_grade,
+        'lowest_grade': stats.lowest_grade,
+        'grade_variance': stats.grade_moments.variance,
+        'grade_stddev': stats.grade_moments.stddev,
+        'age_variance': stats.age_moments.variance,
+        'age_stddev': stats.age_moments.stddev,
+        'grade_distribution': stats.grade_distribution(),
     }
 
 
 def save_results(results, output_file='output/analysis_report.txt'):
-    # Accept either a results dict or plain text
+    """Save a simple text representation of results to the given file.
+
+    Accepts either a results dict or plain text and uses save_report.
+    """
     if isinstance(results, dict):
         lines = ["Analysis Results", "================", ""]
         for k, v in results.items():
@@ -221,6 +1534,7 @@ def save_results(results, output_file='output/analysis_report.txt'):
     return output_file
 
 
+@stage("save_report")
 def save_report(report, filename):
     out_dir = os.path.dirname(filename) or "."
     os.makedirs(out_dir, exist_ok=True)
@@ -228,76 +1542,42 @@ def save_report(report, filename):
         f.write(report)
 
 
+@stage("main")
 def main():
     print("Advanced Student Analysis - Module Usage")
     print("=" * 45)
 
-    students = load_students('data/students.csv')
+    # Served from the on-disk parse cache when STUDENT_CACHE_DIR is set
+    from parse_cache import load_students_cached
+    students = load_students_cached('data/students.csv')
     if not students:
         print("No data loaded. Please check data/students.csv")
         return
 
     print(f"Loaded {len(students)} students")
 
-    average = calculate_average_grade(students)
-    highest = find_highest_grade(students)
-    print(f"Average grade: {average:.1f}")
-    print(f"Highest grade: {highest:.1f}")
+    stats = StudentStats.from_students(students)
+    print(f"Average grade: {stats.average_grade:.1f}")
+    print(f"Highest grade: {stats.highest_grade:.1f}")
 
-    grades = [float(s['grade']) for s in students]
-    distribution = analyze_grade_distribution(grades)
     print("\nGrade Distribution:")
-    for bucket, count in distribution.items():
-        pct = (count / len(students)) * 100
+    for bucket, count in stats.grade_distribution().items():
+        pct = (count / stats.count) * 100
         print(f"{bucket}: {count} students ({pct:.1f}%)")
 
-    top_performers = find_top_performers(students, 90)
-    print(f"\nTop Performers (90+): {len(top_performers)} students")
-    for s in top_performers:
+    top_students = find_top_performers(students, 90)
+    print(f"\nTop Performers (90+): {len(top_students)} students")
+    for s in top_students:
         print(f"  {s['name']}: {float(s['grade']):.1f} ({s['subject']})")
 
-    generate_detailed_report(students, 'output/analysis_modular_report.txt')
+    generate_detailed_report(students, 'output/analysis_modular_report.txt', stats=stats)
 
-    basic_report_text = generate_report()
+    basic_report_text = generate_report(students)
     save_report(basic_report_text, 'output/analysis_report.txt')
 
     print("\n✅ Advanced analysis complete!")
 
 
 if __name__ == "__main__":
-    main()
-
-
-def load_data(path='data/students.csv'):
-    """Load data from CSV and return list of student dicts.
-
-    This is a small compatibility wrapper expected by the tests.
-    """
-    return load_students(path)
-
-
-def analyze_data(students):
-    """Perform a small analysis and return a dictionary of results.
-
-    Tests only check that this function exists, but returning a useful
-    dict allows further programmatic use.
-    """
-    return {
-        'average_grade': calculate_average_grade(students),
-        'average_age': calculate_average_age(students),
-        'math_count': count_math_students(students),
-        'highest_grade': find_highest_grade(students),
-    }
-
-
-def save_results(results, output_file='output/analysis_report.txt'):
-    """Save a simple text representation of results to the given file.
-
-    Uses the existing save_report utility for consistent behavior.
-    """
-    lines = ["Analysis Results", "================", ""]
-    for k, v in results.items():
-        lines.append(f"{k}: {v}")
-    report = "\n".join(lines)
-    save_report(report, output_file)
-    return output_file
+    configure_from_env(sys.argv[1:])
+    run_profiled(main)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Append-aware incremental aggregates for growing roster files.
+
+The StudentStats state is saved to a small JSON file together with the
+byte offset of the last complete line it has consumed, a SHA-256 of that
+consumed prefix and the file's mtime and size. The next run only parses
+rows appended after that offset. If the mtime and size are unchanged the
+state is reused as is; otherwise the whole consumed prefix is re-hashed
+(reading is far cheaper than parsing), and if the file shrank or the
+prefix changed (truncation or a rewrite, even one that keeps the size)
+the state is thrown away and rebuilt from byte 0.
+
+A trailing line without a newline may still be mid-write, so it is
+counted in the returned stats but not folded into the saved state.
+"""
+import hashlib
+import json
+import os
+
+from data_analysis_functions import (
+    CSV_PATH,
+    StudentStats,
+    analyze_stats,
+    data_start,
+    format_report,
+    iter_students,
+    iter_students_range,
+)
+
+STATE_DIR = os.path.join(".cache", "incremental")
+HASH_BLOCK = 1 << 16
+STATE_VERSION = 4
+
+
+def default_state_path(file_path):
+    """State file for a CSV under STATE_DIR, unique per absolute path."""
+    key = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(STATE_DIR, f"{os.path.basename(file_path)}-{key}.json")
+
+
+def _hash_range(digest, f, start, end):
+    """Feed bytes [start, end) of f into a running hashlib digest; returns it."""
+    f.seek(start)
+    pos = start
+    while pos < end:
+        block = f.read(min(HASH_BLOCK, end - pos))
+        if not block:
+            break
+        digest.update(block)
+        pos += len(block)
+    return digest
+
+
+def _complete_end(f, start, size, block=1 << 16):
+    """Offset just past the last newline in [start, size), or start if there is none."""
+    pos = size
+    while pos > start:
+        lo = max(start, pos - block)
+        f.seek(lo)
+        i = f.read(pos - lo).rfind(b"\n")
+        if i >= 0:
+            return lo + i + 1
+        pos = lo
+    return start
+
+
+def _read_state(state_path):
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return state if state.get("version") == STATE_VERSION else None
+
+
+def _write_state(state_path, state):
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    tmp = state_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path)
+
+
+def reset_state(file_path=CSV_PATH, state_path=None):
+    """Delete the saved state so the next update_stats() rebuilds from scratch."""
+    try:
+        os.remove(state_path or default_state_path(file_path))
+    except FileNotFoundError:
+        pass
+
+
+def update_stats(file_path=CSV_PATH, state_path=None):
+    """Return StudentStats for the whole file, parsing only what was appended since last time."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+    state_path = state_path or default_state_path(file_path)
+    state = _read_state(state_path)
+
+    with open(file_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        if state and (state["mtime_ns"], state["size"]) == (st.st_mtime_ns, size):
+            # Untouched since the state was saved: nothing new to fold in or re-hash
+            stats = StudentStats.from_dict(state["stats"])
+            end = state["offset"]
+        else:
+            digest = None
+            if state and state["offset"] <= size:
+                digest = _hash_range(hashlib.sha256(), f, 0, state["offset"])
+                if digest.hexdigest() != state["sha256"]:
+                    digest = None
+            if digest is not None:
+                stats = StudentStats.from_dict(state["stats"])
+                offset = state["offset"]
+            else:
+                f.seek(0)
+                offset = data_start(f)
+                if offset is None:  # bare-CR line endings: no safe byte offsets
+                    return StudentStats().update(iter_students(file_path))
+                stats = StudentStats()
+                if offset >= size:  # nothing past the header, which may itself be mid-write
+                    return stats
+                digest = _hash_range(hashlib.sha256(), f, 0, offset)
+
+            end = _complete_end(f, offset, size)
+            stats.update(iter_students_range(file_path, offset, end))
+            _write_state(state_path, {
+                "version": STATE_VERSION,
+                "path": os.path.abspath(file_path),
+                "offset": end,
+                "sha256": _hash_range(digest, f, offset, end).hexdigest(),
+                "mtime_ns": st.st_mtime_ns,
+                "size": size,
+                "stats": stats.to_dict(),
+            })
+
+    if end < size:
+        stats = StudentStats.from_dict(stats.to_dict()).update(iter_students_range(file_path, end, size))
+    return stats
+
+
+def incremental_report(file_path=CSV_PATH, state_path=None):
+    """generate_report() text computed from the incremental state."""
+    return format_report(update_stats(file_path, state_path))
+
+
+def incremental_analysis(file_path=CSV_PATH, state_path=None):
+    """analyze_data() results computed from the incremental state."""
+    return analyze_stats(update_stats(file_path, state_path))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Opt-in timing and memory instrumentation for the analysis pipeline.
+
+Pipeline functions are wrapped with @stage("name"). While instrumentation
+is off (the default) the wrapper is a single flag check before calling
+through. Turn it on with the STUDENT_PROFILE environment variable or
+enable() (the scripts map --profile to it):
+
+    STUDENT_PROFILE=1        wall time, rows, rows/sec, peak RSS per stage
+    STUDENT_PROFILE=memory   ...plus tracemalloc peak heap per stage
+    STUDENT_PROFILE_OUT=path JSON summary destination (default: stderr)
+    STUDENT_CPROFILE=path    also run main() under cProfile, dumping stats there
+
+The JSON summary is written when the process exits.
+tracemalloc has a single peak counter, so a stage's traced peak only
+covers the time after the last nested stage it called.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILE_ENV = "STUDENT_PROFILE"
+PROFILE_OUT_ENV = "STUDENT_PROFILE_OUT"
+CPROFILE_ENV = "STUDENT_CPROFILE"
+
+_enabled = False
+_trace_memory = False
+_records = {}
+_order = []
+
+
+def enable(memory=False, out=None):
+    """Start recording stages; the summary is written at exit to `out` (or stderr)."""
+    global _enabled, _trace_memory
+    if not _enabled:
+        atexit.register(write_summary, out or os.environ.get(PROFILE_OUT_ENV))
+    _enabled = True
+    _trace_memory = memory
+    if memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """Forget everything recorded so far."""
+    _records.clear()
+    _order.clear()
+
+
+def _count_rows(args, result):
+    for value in (result, args[0] if args else None):
+        count = getattr(value, "count", None)
+        if isinstance(count, int):  # StudentStats
+            return count
+        if value is not None and not isinstance(value, (str, bytes, dict)) and hasattr(value, "__len__"):
+            return len(value)
+    return None
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS reports bytes
+
+
+def _run_stage(name, func, args, kwargs):
+    if _trace_memory:
+        import tracemalloc
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    record = _records.get(name)
+    if record is None:
+        record = _records[name] = {"stage": name, "calls": 0, "seconds": 0.0, "rows": 0}
+        _order.append(name)
+    record["calls"] += 1
+    record["seconds"] += elapsed
+    rows = _count_rows(args, result)
+    if rows is not None:
+        record["rows"] += rows
+    record["peak_rss_kb"] = _peak_rss_kb()
+    if _trace_memory:
+        import tracemalloc
+        record["peak_traced_bytes"] = max(record.get("peak_traced_bytes", 0), tracemalloc.get_traced_memory()[1])
+    return result
+
+
+def stage(name):
+    """Decorator recording wall time, rows and memory for `name` when instrumentation is on."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            return _run_stage(name, func, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def summary():
+    """Return the recorded stages, in first-seen order, as a JSON-ready dict."""
+    stages = []
+    for name in _order:
+        record = dict(_records[name])
+        record["rows_per_sec"] = record["rows"] / record["seconds"] if record["rows"] and record["seconds"] else None
+        stages.append(record)
+    return {"stages": stages}
+
+
+def write_summary(path=None):
+    """Write summary() as JSON to `path`, or to stderr if no path is given."""
+    text = json.dumps(summary(), indent=2)
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file=sys.stderr)
+
+
+def run_profiled(func, *args, cprofile_path=None, **kwargs):
+    """Call func, under cProfile when cprofile_path (or $STUDENT_CPROFILE) is set."""
+    cprofile_path = cprofile_path or os.environ.get(CPROFILE_ENV)
+    if not cprofile_path:
+        return func(*args, **kwargs)
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(cprofile_path)
+
+
+def configure_from_env(argv=None):
+    """Enable instrumentation if $STUDENT_PROFILE is set or --profile is in argv."""
+    mode = os.environ.get(PROFILE_ENV, "")
+    if argv is not None and "--profile" in argv:
+        mode = mode or "1"
+    if mode and mode != "0":
+        enable(memory=(mode == "memory"))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Memory-mapped CSV scanner for student rosters.
+
+Instead of reading the file line by line through a text wrapper, the
+scanner maps it and works a block (about BLOCK_SIZE bytes, cut at a
+newline) at a time: one split per block finds the lines and one
+split(",", 4) per line finds the fields, with no per-field slicing or
+stripping of age and grade (int() and float() ignore the surrounding
+whitespace). scan_stats never decodes the per-row strings at all:
+subjects are counted by their raw bytes and names are decoded only for
+the rows tied at the highest grade.
+
+Rows follow the load_students rules: first non-blank line is the header,
+rows with fewer than four fields are skipped, bad ages become None and
+bad grades 0.0. Files with bare '\\r' line endings fall back to the
+text reader.
+"""
+from contextlib import contextmanager
+import mmap
+
+from data_analysis_functions import (
+    CSV_PATH,
+    StudentStats,
+    analyze_stats,
+    data_start,
+    iter_students,
+)
+
+BLOCK_SIZE = 1 << 16
+
+
+@contextmanager
+def _mapped(file_path):
+    """Yield a read-only mmap of the file, or None if it is empty."""
+    try:
+        f = open(file_path, "rb")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            yield None
+            return
+        with mm:
+            yield mm
+
+
+def _data_offset(mm):
+    """Offset of the first data row, or None if the file has bare '\\r' line endings."""
+    # Blocks end at a newline, so a "\r\n" pair is never split between two of them
+    if mm.find(b"\r") >= 0 and any(b.count(b"\r") != b.count(b"\r\n") for b in _iter_blocks(mm, 0)):
+        return None
+    mm.seek(0)
+    return data_start(mm)
+
+
+def _iter_blocks(mm, start):
+    """Yield mm[start:] in slices of about BLOCK_SIZE bytes, each ending at a newline."""
+    size = len(mm)
+    while start < size:
+        cut = mm.find(b"\n", min(start + BLOCK_SIZE, size) - 1)
+        end = size if cut < 0 else cut + 1
+        yield mm[start:end]
+        start = end
+
+
+def scan_students(file_path=CSV_PATH):
+    """Return the same list of student dicts as load_students, via mmap."""
+    with _mapped(file_path) as mm:
+        if mm is None:
+            return []
+        start = _data_offset(mm)
+        if start is None:
+            return list(iter_students(file_path))
+        students = []
+        append = students.append
+        for block in _iter_blocks(mm, start):
+            for line in block.decode("utf-8").split("\n"):
+                fields = line.split(",", 4)
+                if len(fields) < 4:  # also drops blank lines, which have no commas
+                    continue
+                try:
+                    age = int(fields[1])
+                except ValueError:
+                    age = None
+                try:
+                    grade = float(fields[2])
+                except ValueError:
+                    grade = 0.0
+                append({"name": fields[0].strip(), "age": age, "grade": grade, "subject": fields[3].strip()})
+        return students
+
+
+def scan_stats(file_path=CSV_PATH, moments=True):
+    """Compute StudentStats for a CSV without decoding per-row strings.
+
+    Names are decoded only for rows tied at the highest grade, and subjects
+    are counted by their raw bytes and decoded once per distinct value.
+    """
+    stats = StudentStats(moments)
+    with _mapped(file_path) as mm:
+        if mm is None:
+            return stats
+        start = _data_offset(mm)
+        if start is None:
+            return stats.update(iter_students(file_path))
+
+        raw_subjects = {}
+        for block in _iter_blocks(mm, start):
+            grades, names, ages = [], [], []
+            for line in block.split(b"\n"):
+                fields = line.split(b",", 4)
+                if len(fields) < 4:
+                    continue
+                try:
+                    grades.append(float(fields[2]))
+                except ValueError:
+                    grades.append(0.0)
+                names.append(fields[0])  # raw bytes; only the winners are decoded, below
+                try:
+                    ages.append(int(fields[1]))
+                except ValueError:
+                    pass
+                subject = fields[3]
+                raw_subjects[subject] = raw_subjects.get(subject, 0) + 1
+            stats.count += len(grades)  # every scanned row has a grade (bad ones parse as 0.0)
+            stats.add_grades(grades, names)
+            stats.add_ages(ages)
+
+    stats.top_names = [raw.decode("utf-8").strip() for raw in stats.top_names]
+    for raw, n in raw_subjects.items():
+        key = raw.decode("utf-8").strip() or "Unknown"
+        stats.by_subject[key] = stats.by_subject.get(key, 0) + n
+    return stats
+
+
+def analyze_csv(file_path=CSV_PATH):
+    """analyze_data() for a CSV path, computed straight from the mapped bytes."""
+    return analyze_stats(scan_stats(file_path))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Parallel CSV ingestion for large student rosters.
+
+The file is cut into byte ranges that start right after a newline, and
+each range is streamed line by line (iter_students_range) in a
+ProcessPoolExecutor worker with the same row rules as load_students
+(blank lines and short rows skipped, bad ages -> None, bad grades ->
+0.0). Workers send back either compact columns or a
+StudentStats partial aggregate; both are merged in file order, so the
+results match the serial functions exactly. group_by_parallel does the
+same with GroupedStats partials.
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from data_analysis_functions import (
+    CSV_PATH,
+    GroupedStats,
+    StudentStats,
+    data_start,
+    iter_students,
+    iter_students_range,
+    load_students,
+)
+
+# Ranges smaller than this are not worth a separate process
+MIN_RANGE_BYTES = 1 << 20
+
+
+def plan_byte_ranges(file_path, workers, min_range_bytes=MIN_RANGE_BYTES):
+    """Split the data rows of a CSV into newline-aligned (start, end) byte ranges.
+
+    Returns an empty list when the file should be parsed serially instead.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        start = data_start(f)
+        if start is None:
+            return []
+        count = max(1, min(workers, (size - start) // max(1, min_range_bytes)))
+        bounds = [start]
+        for i in range(1, count):
+            f.seek(start + (size - start) * i // count)
+            f.readline()  # move to the start of the next full line
+            offset = min(f.tell(), size)
+            if offset > bounds[-1]:
+                bounds.append(offset)
+    bounds.append(size)
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i + 1]]
+
+
+def _parse_range_columns(file_path, start, end):
+    """Worker: parse one byte range into (names, ages, grades, subjects) columns."""
+    names, ages, grades, subjects = [], [], array("d"), []
+    for s in iter_students_range(file_path, start, end):
+        names.append(s["name"])
+        ages.append(s["age"])
+        grades.append(s["grade"])
+        subjects.append(s["subject"])
+    return names, ages, grades, subjects
+
+
+def _parse_range_stats(file_path, start, end):
+    """Worker: reduce one byte range to a StudentStats partial aggregate."""
+    return StudentStats().update(iter_students_range(file_path, start, end))
+
+
+def _parse_range_groups(file_path, start, end, key):
+    """Worker: reduce one byte range to a GroupedStats partial aggregate."""
+    return GroupedStats(key).update(iter_students_range(file_path, start, end))
+
+
+def _map_ranges(func, file_path, workers, min_range_bytes, *extra):
+    workers = workers or os.cpu_count() or 1
+    ranges = plan_byte_ranges(file_path, workers, min_range_bytes)
+    if len(ranges) <= 1:
+        return None
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        futures = [pool.submit(func, file_path, start, end, *extra) for start, end in ranges]
+        return [fut.result() for fut in futures]
+
+
+def load_students_parallel(file_path=CSV_PATH, workers=None, min_range_bytes=MIN_RANGE_BYTES):
+    """Parallel load_students: same list of student dicts, parsed across processes."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+    parts = _map_ranges(_parse_range_columns, file_path, workers, min_range_bytes)
+    if parts is None:
+        return load_students(file_path)
+
+    students = []
+    for names, ages, grades, subjects in parts:
+        students.extend(
+            {"name": n, "age": a, "grade": g, "subject": subj}
+            for n, a, g, subj in zip(names, ages, grades, subjects)
+        )
+    return students
+
+
+def student_stats_parallel(file_path=CSV_PATH, workers=None, min_range_bytes=MIN_RANGE_BYTES):
+    """Compute StudentStats for a CSV by merging per-range partial aggregates."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+    parts = _map_ranges(_parse_range_stats, file_path, workers, min_range_bytes)
+    if parts is None:
+        return StudentStats().update(iter_students(file_path))
+
+    stats = StudentStats()
+    for part in parts:
+        stats.merge(part)
+    return stats
+
+
+def group_by_parallel(file_path=CSV_PATH, key="subject", workers=None, min_range_bytes=MIN_RANGE_BYTES):
+    """GroupedStats for a CSV, merged from per-range partials.
+
+    `key` is sent to the workers, so it must be a column name, a tuple of
+    names, or a picklable (module-level) function.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+    parts = _map_ranges(_parse_range_groups, file_path, workers, min_range_bytes, key)
+    if parts is None:
+        return GroupedStats(key).update(iter_students(file_path))
+
+    grouped = GroupedStats(key)
+    for part in parts:
+        grouped.merge(part)
+    return grouped
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""On-disk, content-addressed cache of parsed student rosters.
+
+Parsed rosters are stored as .stcol columnar files (see columnar_format)
+named after the SHA-256 of the CSV contents. A small JSON index remembers, per CSV path, the
+size and mtime seen when that hash was computed, so an unchanged file is
+served without being re-read at all; a changed file is re-hashed and
+only re-parsed if its contents are actually new. Entries are evicted in
+least-recently-used order once the cache grows past max_bytes.
+
+The cache is opt-in: main() only uses it when STUDENT_CACHE_DIR is set.
+"""
+import hashlib
+import json
+import os
+import time
+
+from columnar_format import EXTENSION, load_columnar, save_columnar
+from data_analysis_functions import CSV_PATH, StudentTable, load_students
+
+CACHE_DIR_ENV = "STUDENT_CACHE_DIR"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_INDEX_NAME = "index.json"
+# Bumped when the entry file format changes; entries of other formats are dropped
+_ENTRY_FORMAT = "stcol-1"
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ParseCache:
+    """Size-bounded LRU cache mapping CSV contents to parsed StudentTables."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, _INDEX_NAME)
+        self._index = self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        if index.get("format") != _ENTRY_FORMAT:
+            index = {"format": _ENTRY_FORMAT}
+        index.setdefault("paths", {})
+        index.setdefault("entries", {})
+        return index
+
+    def _write_index(self):
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+
+    def _entry_path(self, digest):
+        return os.path.join(self.cache_dir, digest + EXTENSION)
+
+    def _digest_for(self, file_path):
+        """Content hash for file_path, re-hashing only if size or mtime changed."""
+        st = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        known = self._index["paths"].get(key)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+            return known["sha256"]
+        digest = file_digest(file_path)
+        self._index["paths"][key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def load_table(self, file_path=CSV_PATH):
+        """Return the StudentTable for file_path, parsing and storing it on a miss.
+
+        The table mirrors load_students exactly: iterating it yields the same dicts.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"[ERROR] File not found: {file_path}")
+        digest = self._digest_for(file_path)
+        entry = self._index["entries"].get(digest)
+        if entry is not None:
+            try:
+                table = load_columnar(self._entry_path(digest))[0]
+                entry["last_used"] = time.time()
+                self._write_index()
+                return table
+            except (OSError, ValueError, KeyError):
+                self._drop(digest)
+
+        table = StudentTable.from_students(load_students(file_path))
+        self._store(digest, table)
+        return table
+
+    def _store(self, digest, table):
+        try:
+            path = save_columnar(table, self._entry_path(digest))
+        except ValueError:  # a name with a newline cannot be stored; serve it uncached
+            return
+        self._index["entries"][digest] = {"bytes": os.path.getsize(path), "last_used": time.time()}
+        self._evict()
+        self._write_index()
+
+    def _drop(self, digest):
+        self._index["entries"].pop(digest, None)
+        try:
+            os.remove(self._entry_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Remove least-recently-used entries until the cache fits in max_bytes."""
+        entries = self._index["entries"]
+        total = sum(e["bytes"] for e in entries.values())
+        for digest in sorted(entries, key=lambda d: entries[d]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[digest]["bytes"]
+            self._drop(digest)
+
+    def invalidate(self, file_path=None):
+        """Forget the cached parse of file_path, or of everything if no path is given."""
+        if file_path is None:
+            for digest in list(self._index["entries"]):
+                self._drop(digest)
+            self._index["paths"].clear()
+        else:
+            known = self._index["paths"].pop(os.path.abspath(file_path), None)
+            if known:
+                self._drop(known["sha256"])
+        self._write_index()
+
+
+def default_cache():
+    """Return a ParseCache for $STUDENT_CACHE_DIR, or None if caching is off."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    return ParseCache(cache_dir) if cache_dir else None
+
+
+def load_students_cached(file_path=CSV_PATH, cache=None):
+    """load_students, served from the parse cache when one is configured."""
+    cache = cache or default_cache()
+    if cache is None:
+        return load_students(file_path)
+    return list(cache.load_table(file_path))
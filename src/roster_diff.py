@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Delta reports between two roster snapshots (e.g. yesterday's and today's CSV).
+
+Students are matched on a key ("name" by default; any column, tuple of
+columns or function, as for GroupedStats). Each snapshot is streamed
+once: its rows fold into a StudentStats for the aggregate shifts and are
+hash-partitioned on the key into temp files. The partitions are then
+joined one pair at a time, so only one partition of the old snapshot is
+held in memory. When the old snapshot fits the memory budget there is a
+single partition and nothing is written to disk. At most MAX_PARTITIONS
+files are written at once per snapshot; a partition that still exceeds
+the budget is split again with a differently salted hash before its join.
+
+Repeated keys are paired in file order (the first "Alice" in the old file
+with the first "Alice" in the new one).
+
+Usage:
+    python src/roster_diff.py OLD.csv NEW.csv [--key name] [--output FILE]
+"""
+import argparse
+import heapq
+import math
+import os
+import pickle
+import sys
+import tempfile
+
+from data_analysis_functions import StudentStats, _group_key_fn, _sortable, iter_students, save_report
+from external_sort import DEFAULT_MEMORY_BUDGET, _read_run, parse_size
+from instrumentation import configure_from_env, run_profiled, stage
+
+# In-memory size of a parsed row relative to its CSV text, used to pick the partition count
+ROW_EXPANSION = 16
+# Partition files held open per snapshot (and per re-split of an oversize partition)
+MAX_PARTITIONS = 256
+# Re-split passes before an oversize partition (e.g. one very common key) is joined as is
+MAX_DEPTH = 4
+# A pickled partition file is about twice the size of the CSV text of its rows
+_PICKLE_RATIO = 2
+DEFAULT_LIMIT = 50
+_CHUNK = 1024
+_FIELDS = ("name", "age", "grade", "subject")
+
+
+def _same(a, b):
+    return a == b or (a != a and b != b)  # NaN matches NaN
+
+
+class RosterDiff:
+    """Counts, listed examples and aggregates of the difference between two snapshots."""
+
+    def __init__(self, old_path, new_path, key, limit=DEFAULT_LIMIT):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.key = key
+        self.limit = limit
+        self.old_stats = StudentStats()
+        self.new_stats = StudentStats()
+        self.counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+        self.added = []    # (sort key, student), first `limit` by key
+        self.removed = []
+        self.changed = []  # (sort key, key, old, new, changed fields), largest grade moves first
+
+    def _keep(self, items, entry):
+        items.append(entry)
+        if self.limit is not None and len(items) > 2 * self.limit:
+            items[:] = heapq.nsmallest(self.limit, items, key=lambda e: e[0])
+
+    def _finish(self):
+        for items in (self.added, self.removed, self.changed):
+            items.sort(key=lambda e: e[0])
+            if self.limit is not None:
+                del items[self.limit:]
+
+    def record_added(self, key, s):
+        self.counts["added"] += 1
+        self._keep(self.added, (_sortable(key), s))
+
+    def record_removed(self, key, s):
+        self.counts["removed"] += 1
+        self._keep(self.removed, (_sortable(key), s))
+
+    def compare(self, key, old, new):
+        fields = [f for f in _FIELDS if not _same(old.get(f), new.get(f))]
+        if not fields:
+            self.counts["unchanged"] += 1
+            return
+        self.counts["changed"] += 1
+        move = _grade_move(old, new)
+        self._keep(self.changed, ((-abs(move), _sortable(key)), key, old, new, fields))
+
+
+def _grade_move(old, new):
+    a, b = old.get("grade"), new.get("grade")
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a == a and b == b:
+        return b - a
+    return 0.0
+
+
+class _Partitions:
+    """Append-only pickled buckets of (key, student) pairs, one temp file per partition."""
+
+    def __init__(self, count, tmp_dir):
+        self.paths = []
+        self._files = []
+        self._buffers = [[] for _ in range(count)]
+        for _ in range(count):
+            fd, path = tempfile.mkstemp(prefix="part-", suffix=".pkl", dir=tmp_dir)
+            self.paths.append(path)
+            self._files.append(os.fdopen(fd, "wb"))
+
+    def add(self, part, entry):
+        buffer = self._buffers[part]
+        buffer.append(entry)
+        if len(buffer) >= _CHUNK:
+            pickle.dump(buffer, self._files[part], protocol=pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+
+    def close(self):
+        for buffer, f in zip(self._buffers, self._files):
+            if buffer:
+                pickle.dump(buffer, f, protocol=pickle.HIGHEST_PROTOCOL)
+                buffer.clear()
+            f.close()
+
+
+def _partition_count(size, memory_budget):
+    return max(1, min(MAX_PARTITIONS, math.ceil(size * ROW_EXPANSION / memory_budget)))
+
+
+def _partition(entries, count, depth, tmp_dir):
+    """Spread (key, student) entries over count temp files; returns their paths."""
+    partitions = _Partitions(count, tmp_dir)
+    for key, s in entries:
+        # Salting with the depth sends the keys of one partition to different sub-partitions
+        partitions.add(hash((depth, key)) % count, (key, s))
+    partitions.close()
+    return partitions.paths
+
+
+def _join(diff, old_entries, new_entries):
+    """Match one partition: old rows are indexed in memory, new rows streamed past them."""
+    pending = {}
+    for key, s in old_entries:
+        pending.setdefault(key, []).append(s)
+    for key, s in new_entries:
+        matches = pending.get(key)
+        if matches:
+            diff.compare(key, matches.pop(0), s)
+            if not matches:
+                del pending[key]
+        else:
+            diff.record_added(key, s)
+    for key, rows in pending.items():
+        for s in rows:
+            diff.record_removed(key, s)
+
+
+def _join_partitions(diff, old_paths, new_paths, memory_budget, tmp_dir, depth=0):
+    for old_part, new_part in zip(old_paths, new_paths):
+        count = _partition_count(os.path.getsize(old_part) // _PICKLE_RATIO, memory_budget)
+        if count > 1 and depth < MAX_DEPTH:
+            old_sub = _partition(_read_run(old_part), count, depth + 1, tmp_dir)
+            new_sub = _partition(_read_run(new_part), count, depth + 1, tmp_dir)
+            os.remove(old_part)
+            os.remove(new_part)
+            _join_partitions(diff, old_sub, new_sub, memory_budget, tmp_dir, depth + 1)
+            continue
+        _join(diff, _read_run(old_part), _read_run(new_part))
+        os.remove(old_part)
+        os.remove(new_part)
+
+
+@stage("diff_rosters")
+def diff_rosters(old_path, new_path, key="name", memory_budget=DEFAULT_MEMORY_BUDGET,
+                 limit=DEFAULT_LIMIT, tmp_dir=None):
+    """Compare two roster CSVs; returns a RosterDiff (limit=None lists every student)."""
+    for path in (old_path, new_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"[ERROR] File not found: {path}")
+    key_fn = _group_key_fn(key)
+    diff = RosterDiff(old_path, new_path, key, limit)
+    count = _partition_count(os.path.getsize(old_path), memory_budget)
+
+    def keyed(path, stats):
+        for s in iter_students(path):
+            stats.add(s)
+            yield key_fn(s), s
+
+    if count == 1:
+        _join(diff, keyed(old_path, diff.old_stats), keyed(new_path, diff.new_stats))
+        diff._finish()
+        return diff
+
+    with tempfile.TemporaryDirectory(prefix="roster-diff-", dir=tmp_dir) as work:
+        old_parts = _partition(keyed(old_path, diff.old_stats), count, 0, work)
+        new_parts = _partition(keyed(new_path, diff.new_stats), count, 0, work)
+        _join_partitions(diff, old_parts, new_parts, memory_budget, work)
+    diff._finish()
+    return diff
+
+
+def _shift(label, old, new, fmt="{:.1f}"):
+    delta = new - old
+    return f"{label}: {fmt.format(old)} -> {fmt.format(new)} ({'+' if delta >= 0 else ''}{fmt.format(delta)})"
+
+
+def _student_line(s):
+    grade = s.get("grade")
+    grade_text = f"{float(grade):.1f}" if isinstance(grade, (int, float)) else "None"
+    return f"  {s.get('name')} (grade {grade_text}, {s.get('subject')})"
+
+
+def _change_line(key, old, new, fields):
+    parts = []
+    for field in fields:
+        if field == "grade":
+            move = _grade_move(old, new)
+            parts.append(f"grade {old.get('grade')} -> {new.get('grade')} ({'+' if move >= 0 else ''}{move:.1f})")
+        else:
+            parts.append(f"{field} {old.get(field)} -> {new.get(field)}")
+    label = ", ".join(map(str, key)) if isinstance(key, tuple) else key
+    return f"  {label}: " + "; ".join(parts)
+
+
+def format_diff_report(diff):
+    """Render a RosterDiff in the plain-text style of format_report."""
+    old, new = diff.old_stats, diff.new_stats
+    lines = []
+    lines.append("Roster Delta Report")
+    lines.append("=" * 30)
+    lines.append(f"Old snapshot: {diff.old_path}")
+    lines.append(f"New snapshot: {diff.new_path}")
+    lines.append(f"Matched on: {diff.key if isinstance(diff.key, str) else getattr(diff.key, '__name__', diff.key)}")
+    for name in ("added", "removed", "changed", "unchanged"):
+        lines.append(f"{name.capitalize()}: {diff.counts[name]}")
+    lines.append("")
+    lines.append("Aggregate changes:")
+    lines.append("  " + _shift("Total students", old.count, new.count, "{:d}"))
+    lines.append("  " + _shift("Average grade", old.average_grade, new.average_grade))
+    lines.append("  " + _shift("Average age", old.average_age, new.average_age))
+    lines.append("  " + _shift("Highest grade", old.highest_grade, new.highest_grade))
+    lines.append("  " + _shift("Math students", old.math_count, new.math_count, "{:d}"))
+    lines.append("")
+    lines.append("Counts by subject:")
+    for subj in sorted(set(old.by_subject) | set(new.by_subject)):
+        lines.append("  " + _shift(subj, old.by_subject.get(subj, 0), new.by_subject.get(subj, 0), "{:d}"))
+
+    sections = (
+        ("Added students", diff.added, lambda e: _student_line(e[1]), "added"),
+        ("Removed students", diff.removed, lambda e: _student_line(e[1]), "removed"),
+        ("Changed students (largest grade changes first)", diff.changed,
+         lambda e: _change_line(*e[1:]), "changed"),
+    )
+    for title, items, render, name in sections:
+        if not items:
+            continue
+        lines.append("")
+        lines.append(f"{title}:")
+        lines.extend(render(e) for e in items)
+        hidden = diff.counts[name] - len(items)
+        if hidden > 0:
+            lines.append(f"  ... and {hidden} more")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report what changed between two roster CSVs.")
+    parser.add_argument("old", help="earlier snapshot")
+    parser.add_argument("new", help="later snapshot")
+    parser.add_argument("--key", default="name",
+                        help="column(s) that identify a student, comma separated (default: name)")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT,
+                        help="students listed per section (0 = all)")
+    parser.add_argument("--memory-budget", type=parse_size, default=DEFAULT_MEMORY_BUDGET,
+                        help="memory for parsed rows before partitioning to disk, e.g. 256M (default: 64M)")
+    parser.add_argument("--output", help="write the report here instead of printing it")
+    parser.add_argument("--profile", action="store_true", help="print per-stage timings as JSON at exit")
+    args = parser.parse_args(argv)
+    configure_from_env(sys.argv[1:] if argv is None else argv)
+
+    key = tuple(args.key.split(",")) if "," in args.key else args.key
+    diff = diff_rosters(args.old, args.new, key, args.memory_budget, args.limit or None)
+    report = format_diff_report(diff)
+    if args.output:
+        save_report(report, args.output)
+        print(f"Delta report written to {args.output}")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    run_profiled(main)
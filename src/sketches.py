@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Bounded-memory approximate statistics for very large rosters.
+
+KLLSketch answers quantile/rank queries and HyperLogLog counts distinct
+values; both use memory independent of the number of rows and can be
+merged across chunks or worker processes. ApproxStats bundles them for
+analyze_data(approximate=True) and analyze_grade_distribution(approximate=True).
+Every estimate is reported together with its error bound.
+"""
+import hashlib
+import math
+import random
+
+from data_analysis_functions import GRADE_BUCKETS, _subject_key
+
+
+class _Compactor(list):
+    def compact(self, rng):
+        """Sort, then keep every other item (random offset); the kept items move up a level."""
+        self.sort()
+        offset = rng.random() < 0.5
+        promoted = self[offset::2] if len(self) % 2 == 0 else self[:-1][offset::2]
+        leftover = self[-1:] if len(self) % 2 else []
+        self[:] = leftover
+        return promoted
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items at level h stand for 2**h original values. Memory is O(k log(n/k));
+    the rank error is about normalized_rank_error() * n with high probability.
+    Until the first compaction the sketch is exact.
+    """
+
+    def __init__(self, k=200, c=2 / 3, seed=217):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactors = [_Compactor()]
+        self._rng = random.Random(seed)
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append(_Compactor())
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _size(self):
+        return sum(len(c) for c in self.compactors)
+
+    def _compress(self):
+        for h, compactor in enumerate(self.compactors):
+            if len(compactor) >= self._capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self._grow()
+                self.compactors[h + 1].extend(compactor.compact(self._rng))
+                return
+
+    def update(self, x):
+        if x != x:  # NaN has no rank
+            return
+        self.n += 1
+        self.compactors[0].append(x)
+        if self._size() >= self._max_size:
+            self._compress()
+
+    def extend(self, values):
+        for x in values:
+            self.update(x)
+        return self
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for h, compactor in enumerate(other.compactors):
+            self.compactors[h].extend(compactor)
+        self.n += other.n
+        while self._size() >= self._max_size:
+            self._compress()
+        return self
+
+    def _weighted(self):
+        items = [(x, 1 << h) for h, c in enumerate(self.compactors) for x in c]
+        items.sort(key=lambda item: item[0])
+        return items
+
+    def rank(self, x):
+        """Estimated number of values strictly below x."""
+        return sum(len([v for v in c if v < x]) << h for h, c in enumerate(self.compactors))
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1); 0.0 for an empty sketch."""
+        items = self._weighted()
+        if not items:
+            return 0.0
+        total = sum(w for _, w in items)
+        target = q * total
+        seen = 0
+        for x, w in items:
+            seen += w
+            if seen >= target:
+                return x
+        return items[-1][0]
+
+    def normalized_rank_error(self):
+        """Approximate rank error as a fraction of n (0.0 while the sketch is still exact)."""
+        if len(self.compactors) == 1:
+            return 0.0
+        # Empirical 99%-confidence bound for KLL with this k (1.65% at k=200)
+        return min(1.0, 3.3 / self.k)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**p one-byte registers.
+
+    Values are hashed with BLAKE2b (stable across processes, so sketches
+    from different workers can be merged). Relative standard error is
+    about 1.04 / sqrt(2**p).
+    """
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - rest.bit_length() + 1
+        if rho > self.registers[index]:
+            self.registers[index] = rho
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("[ERROR] Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return raw
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+
+class ApproxStats:
+    """Constant-memory, mergeable approximate roster statistics."""
+
+    def __init__(self, k=200, p=14):
+        self.grades = KLLSketch(k)
+        self.names = HyperLogLog(p)
+        self.subjects = HyperLogLog(p)
+
+    def add(self, s):
+        grade = s.get("grade")
+        if isinstance(grade, (int, float)):
+            self.grades.update(grade)
+        self.names.add(s.get("name"))
+        self.subjects.add(_subject_key(s))
+
+    def update(self, students):
+        for s in students:
+            self.add(s)
+        return self
+
+    def merge(self, other):
+        self.grades.merge(other.grades)
+        self.names.merge(other.names)
+        self.subjects.merge(other.subjects)
+        return self
+
+    def results(self, percentiles=(25, 50, 75, 90)):
+        """Estimates with error bounds: quantiles carry a rank error, distinct counts a relative one."""
+        rank_error = self.grades.normalized_rank_error()
+        results = {
+            f"p{p}_grade": {"value": self.grades.quantile(p / 100), "rank_error": rank_error}
+            for p in percentiles
+        }
+        for name, hll in (("distinct_names", self.names), ("distinct_subjects", self.subjects)):
+            results[name] = {"value": round(hll.estimate()), "relative_error": hll.relative_error()}
+        return results
+
+    def grade_distribution(self, buckets=GRADE_BUCKETS):
+        """{label: (estimated count, +/- count error)} for (label, lower bound) buckets, highest first."""
+        n = self.grades.n
+        error = round(2 * self.grades.normalized_rank_error() * n)
+        distribution = {}
+        upper_rank = n
+        for label, lower in buckets:
+            lower_rank = 0 if lower is None else self.grades.rank(lower)
+            distribution[label] = (max(0, upper_rank - lower_rank), error)
+            upper_rank = min(upper_rank, lower_rank)
+        return distribution